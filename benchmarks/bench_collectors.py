@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Offline benchmark of the collectors against local stand-ins.
+
+Every collector runs in a fresh process with an empty state directory, once
+cold and then --runs - 1 more times warm (caches, cursors and snapshots left by
+the previous run), against a synthetic SQLite report_view and a local HTTP
+server imitating Confluence, GitHub and GitLab. For every run it reports wall
+time, HTTP requests and bytes served, SQL queries, lines emitted and the peak
+RSS of the process, so that a regression shows up as a number.
+
+    python3 benchmarks/bench_collectors.py --rows 1000000 --commits 20000 --latency 0.05
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from functools import partial
+
+from standins import SQLiteConnection, StandInServer, build_database, build_git_repo
+
+COLLECTORS = ('milestones', 'milestones_incremental', 'gitlab_commits', 'gitlab_commits_git', 'github2_commits',
+              'github2_commits_git', 'github_auth')
+
+
+def collector_process(name, runs, state_dir, base_url, git_base, db_path, results, go):
+    "runs collector name runs times, reporting each run on results and waiting for go in between"
+    os.environ['SLE_PERF_STATE_DIR'] = state_dir
+    import db_pool
+    import github2_commits
+    import github_api
+    import github_auth
+    import gitlab_commits
+    import milestone_collector
+    from commit_common import commit_emitted
+    logging.disable(logging.WARNING)
+
+    config = {'github_token': 'stand-in', 'username': 'user', 'password': 'secret'}
+    for page, role_config in enumerate(milestone_collector.ROLES.values(), 1000):
+        config[role_config['confluence_url']] = f"{base_url}/confluence/rest/api/content/{page}?expand=body.view"
+    milestone_collector.load_sle_config = lambda *args: config
+    github_auth.load_sle_config = lambda *args: config
+    github_api.BASE_API_URL = f"{base_url}/github/repos"
+    github_api.GRAPHQL_URL = f"{base_url}/github/graphql"
+    github_api.GIT_BASE_URL = git_base
+    gitlab_commits.BASE_API_URL = f"{base_url}/gitlab/api/v4"
+
+    connections = []
+
+    def connect():
+        connections.append(SQLiteConnection(db_path))
+        return connections[-1]
+
+    db_pool.pools['old_db'] = db_pool.ConnectionPool('old_db', connect)
+    db_pool.pools['new_db'] = db_pool.ConnectionPool('new_db', connect)
+
+    collect = {
+        'milestones': milestone_collector.insert_status_counts,
+        'milestones_incremental': partial(milestone_collector.insert_status_counts, incremental=True),
+        'gitlab_commits': gitlab_commits.collect,
+        'gitlab_commits_git': partial(gitlab_commits.collect, backend='git'),
+        'github2_commits': github2_commits.collect,
+        'github2_commits_git': partial(github2_commits.collect, backend='git'),
+        'github_auth': github_auth.collect,
+    }[name]
+
+    for run in range(runs):
+        queries = sum(c.queries for c in connections)
+        start = time.perf_counter()
+        lines = collect()
+        wall = time.perf_counter() - start
+        # as after writing the lines, so that the next run only emits what changed
+        commit_emitted([lines])
+        results.put({'wall_s': wall, 'queries': sum(c.queries for c in connections) - queries, 'lines': len(lines),
+                     'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+        go.get()
+
+
+def benchmark(names, runs, server, git_base, db_path):
+    ctx = multiprocessing.get_context('spawn')
+    report = []
+    for name in names:
+        with tempfile.TemporaryDirectory(prefix='sle-perf-bench-') as state_dir:
+            results, go = ctx.Queue(), ctx.Queue()
+            server.reset_counters()
+            # every collector starts with a fresh GitHub rate limit; its warm runs use up the same one
+            server.reset_rate_limits()
+            process = ctx.Process(target=collector_process, args=(name, runs, state_dir, server.url, git_base, db_path, results, go))
+            process.start()
+            for run in range(runs):
+                result = results.get(timeout=3600)
+                result.update({'collector': name, 'run': 'cold' if run == 0 else f"warm{run}",
+                               'requests': server.requests, 'kbytes': server.bytes / 1024})
+                server.reset_counters()
+                report.append(result)
+                go.put(True)
+            process.join()
+            if process.exitcode:
+                raise RuntimeError(f"{name} exited with {process.exitcode}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the collectors offline against local stand-ins.")
+    parser.add_argument('--rows', type=int, default=100000, help="report_view rows (default: %(default)s)")
+    parser.add_argument('--db', default=None, help="SQLite file to build or reuse (default: in a temporary directory)")
+    parser.add_argument('--commits', type=int, default=5000, help="commits in each stand-in repository (default: %(default)s)")
+    parser.add_argument('--days', type=int, default=3650, help="days of history those commits span (default: %(default)s)")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every HTTP request (default: %(default)s)")
+    parser.add_argument('--page-kb', type=int, default=256, help="size of the Confluence page body (default: %(default)s)")
+    parser.add_argument('--github-rate-limit', type=int, default=5000,
+                        help="GitHub requests per hour and token, or without one, before the stand-in refuses them "
+                             "(default: %(default)s; GitHub allows 60 without a token)")
+    parser.add_argument('--runs', type=int, default=2, help="runs per collector, the first one cold (default: %(default)s)")
+    parser.add_argument('--only', action='append', choices=COLLECTORS, help="benchmark only these collectors")
+    parser.add_argument('--json', help="also write the results to this file")
+    args = parser.parse_args()
+
+    import milestone_collector
+    logging.disable(logging.WARNING)
+    milestones = sorted({m for role in milestone_collector.ROLES.values() for m in role['bug_milestones']})
+
+    with tempfile.TemporaryDirectory(prefix='sle-perf-bench-db-') as tmp:
+        db_path = args.db or os.path.join(tmp, 'report_view.sqlite')
+        start = time.perf_counter()
+        build_database(db_path, args.rows, milestone_collector.ROLES)
+        print(f"# report_view with {args.rows} rows ready in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+        server = StandInServer(milestones, latency=args.latency, commits=args.commits, days=args.days,
+                               page_kb=args.page_kb, rate_limit=args.github_rate_limit).start()
+        # one repository with the stand-in history, under the names of every GitHub project
+        git_base = os.path.join(tmp, 'git')
+        server.git_repo = os.path.join(git_base, 'stand-in.git')
+        build_git_repo(server.git_repo, server.commits)
+        import github2_commits
+        import github_auth
+        for pj_name in github2_commits.PROJECTS + github_auth.PROJECTS:
+            os.makedirs(os.path.dirname(os.path.join(git_base, pj_name)), exist_ok=True)
+            os.symlink(server.git_repo, os.path.join(git_base, f"{pj_name}.git"))
+        report = benchmark(args.only or COLLECTORS, max(1, args.runs), server, git_base, db_path)
+        server.shutdown()
+
+    columns = ('collector', 'run', 'wall_s', 'requests', 'kbytes', 'queries', 'lines', 'peak_rss_mb')
+    print(' '.join(f"{c:>16}" for c in columns))
+    for result in report:
+        print(' '.join(f"{result[c]:>16.3f}" if isinstance(result[c], float) else f"{result[c]:>16}" for c in columns))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""Local stand-ins for the services the collectors talk to, for offline benchmarks.
+
+- SQLiteConnection: a pymysql-like connection on SQLite ('%s' placeholders,
+  GET_LOCK/RELEASE_LOCK, case-insensitive text like MySQL's default collation)
+  which counts the queries it runs.
+- build_database(): fills a synthetic report_view and the milestone tables.
+- StandInServer: a threaded HTTP server imitating the Confluence page API, the
+  paginated GitHub (REST and GraphQL) and GitLab commit APIs, with configurable
+  latency, history size and GitHub rate limit, which counts requests and bytes sent.
+- build_git_repo(): a local repository with the same history, for the git backends.
+"""
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+MILESTONE_TABLES = ('perfData', 'VirtPerfData', 'RealTimeData', 'ALPData')
+
+NOISE_ROLES = ('functional', 'kernel', 'security', 'HPC', 'SAP')
+NOISE_RELEASES = ('SLES-15-SP3', 'SLES-15-SP4', 'SLES-15-SP6', 'SLES-16')
+NOISE_BUILDS = ('Build10.1', 'Build33.2', 'Snapshot20230101', 'Alpha1', 'RC3')
+STATUSES = ('pass', 'fail', 'skipped', 'running')
+
+
+class SQLiteCursor:
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection.db.cursor()
+
+    def execute(self, query, args=()):
+        self._connection.queries += 1
+        return self._cursor.execute(query.replace('%s', '?'), tuple(args or ()))
+
+    def executemany(self, query, args):
+        self._connection.queries += 1
+        return self._cursor.executemany(query.replace('%s', '?'), args)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SQLiteConnection:
+    "the subset of a pymysql connection the collectors use, on top of a SQLite file"
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.create_function('GET_LOCK', 2, lambda name, timeout: 1)
+        self.db.create_function('RELEASE_LOCK', 1, lambda name: 1)
+        self.queries = 0
+
+    def cursor(self):
+        return SQLiteCursor(self)
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def ping(self, reconnect=False):
+        self.db.execute('SELECT 1')
+
+    def close(self):
+        self.db.close()
+
+
+def build_database(path, rows, roles, seed=0, chunk=100000):
+    """Creates a SQLite database at path with rows synthetic report_view rows.
+
+    Rows are spread over the configured roles, releases and builds (so every
+    collector finds its milestones) and over noise roles, releases and builds
+    which the collectors must filter out. An existing database with the same
+    number of rows is reused.
+    """
+    if os.path.exists(path):
+        db = sqlite3.connect(path)
+        try:
+            if db.execute('SELECT COUNT(*) FROM report_view').fetchone()[0] == rows:
+                return
+        except sqlite3.Error:
+            pass
+        finally:
+            db.close()
+        os.unlink(path)
+
+    rng = random.Random(seed)
+    combos = []
+    for role, role_config in roles.items():
+        for item in role_config['releases']:
+            for build in item['builds']:
+                combos.append((role, item['release'] or rng.choice(NOISE_RELEASES), build))
+    db = sqlite3.connect(path)
+    db.execute("""
+        CREATE TABLE report_view (
+            id INTEGER PRIMARY KEY,
+            q_role_name TEXT COLLATE NOCASE,
+            q_release TEXT COLLATE NOCASE,
+            q_build TEXT COLLATE NOCASE,
+            status TEXT COLLATE NOCASE
+        )""")
+    for table in MILESTONE_TABLES:
+        db.execute(f"""
+            CREATE TABLE {table} (
+                no_tests_total INTEGER, no_tests_pass INTEGER, no_tests_fail INTEGER, no_tests_bug INTEGER,
+                mileStone_Version TEXT COLLATE NOCASE, execution_date TEXT
+            )""")
+
+    def generate(count):
+        for _ in range(count):
+            if rng.random() < 0.3:
+                role, release, build = rng.choice(combos)
+            else:
+                role = rng.choice(NOISE_ROLES + tuple(roles))
+                release = rng.choice(NOISE_RELEASES)
+                build = rng.choice(NOISE_BUILDS)
+            yield role, release, build, rng.choice(STATUSES)
+
+    done = 0
+    while done < rows:
+        count = min(chunk, rows - done)
+        db.executemany('INSERT INTO report_view (q_role_name, q_release, q_build, status) VALUES (?, ?, ?, ?)',
+                       generate(count))
+        done += count
+    db.commit()
+    db.close()
+
+
+def commit_dates(total, days, newest=datetime(2024, 6, 30, 12, tzinfo=timezone.utc)):
+    "returns total commit times spread evenly over days, newest first"
+    step = timedelta(days=days) / max(total, 1)
+    return [newest - step * i for i in range(total)]
+
+
+def commit_author(i):
+    "returns the author of the i-th stand-in commit: a few frequent ones and a long tail"
+    return f"Author {i % 5}" if i % 3 else f"Author {i % 997}"
+
+
+def build_git_repo(path, dates):
+    "creates a bare git repository at path with one commit per date, each changing a file of one of 23 test areas"
+    subprocess.run(['git', 'init', '--quiet', '--bare', '--initial-branch=main', path], check=True)
+    importer = subprocess.Popen(['git', '-C', path, 'fast-import', '--quiet'], stdin=subprocess.PIPE)
+    for i, date in enumerate(sorted(dates)):
+        # numbered newest first, like the API stand-ins
+        n = len(dates) - 1 - i
+        message = f"commit {n}\n".encode()
+        content = f"{n}\n".encode()
+        importer.stdin.write(f"commit refs/heads/main\nauthor {commit_author(n)} <a{n % 997}@example.com> "
+                             f"{int(date.timestamp())} +0000\ncommitter Stand In <stand-in@example.com> "
+                             f"{int(date.timestamp())} +0000\ndata {len(message)}\n".encode() + message +
+                             f"M 644 inline tests/area{n % 23}/main.pm\ndata {len(content)}\n".encode() + content + b"\n")
+    importer.stdin.close()
+    if importer.wait():
+        raise RuntimeError(f"git fast-import failed for {path}")
+
+
+def confluence_page(milestones, filler_kb):
+    rng = random.Random(1)
+    rows = ''.join(f"<tr><td>{m} Total Bugs ={rng.randint(0, 50)}</td></tr>" for m in milestones)
+    filler = '<p>' + 'lorem ipsum dolor sit amet ' * (filler_kb * 1024 // 27) + '</p>'
+    return f"<table>{rows}</table>{filler}"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, data, headers=None, status=200):
+        body = json.dumps(data).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.count(len(body))
+
+    def rate_limited(self):
+        "takes a request off the caller's GitHub rate limit; returns its X-RateLimit-* headers, or None when used up"
+        allowed, headers = self.server.take_request(self.headers.get('Authorization'))
+        if not allowed:
+            self.send_json({'message': 'API rate limit exceeded'}, headers, status=403)
+            return None
+        return headers
+
+    def do_GET(self):
+        server = self.server
+        server.count(0, request=True)
+        time.sleep(server.latency)
+        parts = urlsplit(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        path = parts.path.split('/')
+
+        if parts.path.startswith('/confluence/rest/api/content/'):
+            expand = query.get('expand', '').split(',')
+            data = {'id': path[-1], 'type': 'page'}
+            if 'version' in expand:
+                data['version'] = {'number': server.confluence_version}
+            for representation in ('view', 'storage'):
+                if f"body.{representation}" in expand:
+                    data.setdefault('body', {})[representation] = {'value': server.confluence_body}
+            return self.send_json(data)
+
+        page = int(query.get('page', 1))
+        per_page = int(query.get('per_page', 30 if parts.path.startswith('/github/') else 20))
+        dates = server.commits
+        if 'since' in query:
+            since = datetime.fromisoformat(query['since'].replace('Z', '+00:00'))
+            dates = [d for d in dates if d >= since]
+        if 'until' in query:
+            until = datetime.fromisoformat(query['until'].replace('Z', '+00:00'))
+            dates = [d for d in dates if d <= until]
+        chunk = dates[(page - 1) * per_page:page * per_page]
+
+        if parts.path.startswith('/github/repos/'):
+            headers = self.rate_limited()
+            if headers is None:
+                return
+            offset = (page - 1) * per_page
+            return self.send_json([{'sha': f"{i:040x}",
+                                    'commit': {'author': {'name': commit_author(offset + i)},
+                                               'committer': {'date': d.strftime('%Y-%m-%dT%H:%M:%SZ')}}}
+                                   for i, d in enumerate(chunk)], headers)
+        if parts.path.startswith('/gitlab/api/v4/projects/') and len(path) == 6:
+            return self.send_json({'id': int(path[-1]), 'http_url_to_repo': server.git_repo})
+        if parts.path.startswith('/gitlab/api/v4/projects/'):
+            total_pages = max(1, -(-len(dates) // per_page))
+            offset = (page - 1) * per_page
+            return self.send_json([{'id': f"{i:040x}", 'author_name': commit_author(offset + i),
+                                    'committed_date': d.strftime('%Y-%m-%dT%H:%M:%S.000+00:00')}
+                                   for i, d in enumerate(chunk)],
+                                  {'X-Total-Pages': str(total_pages), 'X-Total': str(len(dates)),
+                                   'X-Next-Page': str(page + 1) if page < total_pages else ''})
+        self.send_error(404)
+
+    def do_POST(self):
+        server = self.server
+        server.count(0, request=True)
+        time.sleep(server.latency)
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path != '/github/graphql':
+            return self.send_error(404)
+        if not self.headers.get('Authorization'):
+            return self.send_json({'message': 'This endpoint requires you to be authenticated.'})
+        headers = self.rate_limited()
+        if headers is None:
+            return
+
+        # the history connection of the GraphQL API, endCursor being the offset of the next commit
+        variables = request.get('variables', {})
+        dates = server.commits
+        if variables.get('since'):
+            since = datetime.fromisoformat(variables['since'].replace('Z', '+00:00'))
+            dates = [d for d in dates if d >= since]
+        offset = int(variables.get('after') or 0)
+        chunk = dates[offset:offset + 100]
+        history = {'pageInfo': {'hasNextPage': offset + 100 < len(dates), 'endCursor': str(offset + len(chunk))},
+                   'nodes': [{'committedDate': d.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                              'author': {'name': commit_author(offset + i)}} for i, d in enumerate(chunk)]}
+        self.send_json({'data': {'repository': {'defaultBranchRef': {'target': {'history': history}}}}}, headers)
+
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, milestones, latency=0.0, commits=5000, days=3650, page_kb=256, rate_limit=5000):
+        super().__init__(('127.0.0.1', 0), StandInHandler)
+        self.latency = latency
+        # GitHub requests per hour and caller (Authorization header); GitHub itself allows 60 without a token
+        self.rate_limit = rate_limit
+        self.rate_used = {}
+        self.rate_reset = time.time() + 3600
+        self.commits = commit_dates(commits, days)
+        self.confluence_version = 1
+        self.confluence_body = confluence_page(milestones, page_kb)
+        # local repository holding the same commits, for the git backends
+        self.git_repo = None
+        self.requests = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def count(self, size, request=False):
+        with self._lock:
+            self.requests += int(request)
+            self.bytes += size
+
+    def take_request(self, caller):
+        "counts a GitHub request of caller; returns whether it is allowed, and the X-RateLimit-* headers"
+        with self._lock:
+            if time.time() >= self.rate_reset:
+                self.reset_rate_limits()
+            allowed = self.rate_used.get(caller, 0) < self.rate_limit
+            if allowed:
+                self.rate_used[caller] = self.rate_used.get(caller, 0) + 1
+            return allowed, {'X-RateLimit-Limit': str(self.rate_limit),
+                             'X-RateLimit-Remaining': str(self.rate_limit - self.rate_used.get(caller, 0)),
+                             'X-RateLimit-Reset': str(int(self.rate_reset))}
+
+    def reset_rate_limits(self):
+        self.rate_used = {}
+        self.rate_reset = time.time() + 3600
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='stand-in', daemon=True).start()
+        return self
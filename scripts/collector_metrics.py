@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Self-instrumentation of the collectors, emitted as the sle_perf_collector measurement.
+
+Enabled with SLE_PERF_SELF_METRICS=1. Each collector run times its phases with
+a monotonic clock and counts what it moved; the result is one extra line of
+line protocol next to the collector's normal output. When disabled every call
+goes to a shared no-op object.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from socket import getfqdn
+
+from line_protocol import format_line
+
+ENABLED = os.environ.get('SLE_PERF_SELF_METRICS', '') not in ('', '0')
+
+MEASUREMENT = 'sle_perf_collector'
+
+# always reported, so that a 0 is visible in the dashboards
+COUNTERS = ('http_requests', 'http_bytes', 'retries', 'rows_fetched', 'rows_inserted')
+
+hostname = getfqdn()
+
+
+class CollectorMetrics:
+    def __init__(self, collector):
+        self.collector = collector
+        self.phases = Counter()
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+
+    @contextmanager
+    def phase(self, name):
+        "adds the time spent in the with block to phase name"
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.monotonic() - start)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.phases[name] += seconds
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def line(self) -> str:
+        with self._lock:
+            fields = {f"{name}_seconds": float(seconds) for name, seconds in sorted(self.phases.items())}
+            fields['total_seconds'] = float(time.monotonic() - self._start)
+            fields.update({name: int(self.counters[name]) for name in COUNTERS})
+            fields.update({name: int(n) for name, n in sorted(self.counters.items()) if name not in COUNTERS})
+        return format_line(MEASUREMENT, {'collector': self.collector, 'machine': hostname}, fields, time.time_ns())
+
+
+class NullMetrics:
+    collector = None
+
+    def phase(self, name):
+        return nullcontext()
+
+    def add_time(self, name, seconds):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+
+NULL = NullMetrics()
+
+registry = {}
+registry_lock = threading.Lock()
+
+
+def begin(collector):
+    "starts a new run of collector and returns its metrics"
+    if not ENABLED:
+        return NULL
+    with registry_lock:
+        registry[collector] = CollectorMetrics(collector)
+        return registry[collector]
+
+
+def get(collector):
+    "returns the metrics of the current run of collector"
+    if not ENABLED:
+        return NULL
+    with registry_lock:
+        if collector not in registry:
+            registry[collector] = CollectorMetrics(collector)
+        return registry[collector]
+
+
+def lines(collector) -> list:
+    "returns the sle_perf_collector line of collector's current run, or nothing when disabled"
+    return [get(collector).line()] if ENABLED else []
+
+
+def instrument_session(session, collector):
+    "counts the requests and bytes downloaded through a requests session towards collector"
+    if not ENABLED:
+        return
+
+    def count_response(response, *args, **kwargs):
+        metrics = get(collector)
+        metrics.count('http_requests')
+        metrics.count('http_bytes', len(response.content or b''))
+
+    session.hooks['response'].append(count_response)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""Backfill of long commit histories in parallel date windows.
+
+A backfill splits its date range into since/until windows of whole UTC days
+and fetches them through a bounded worker pool. Every finished window is
+checkpointed, so an interrupted backfill started again with the same range
+only fetches the windows still missing. Once all windows of a project are in,
+they are merged into its per-day counts, which become the collector's saved
+history, and emitted like a normal run.
+"""
+
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+
+from commit_common import Emission, commit_lines, record_project, rollup_lines
+from sle_state import load_state, save_state
+
+# days per window and windows fetched at once
+WINDOW_DAYS = 30
+WORKERS = 4
+
+
+def date_windows(start: date, end: date, days: int = WINDOW_DAYS) -> list:
+    "returns (since, until) ISO times covering start to end (both included) in windows of days"
+    windows = []
+    while start <= end:
+        last = min(start + timedelta(days=days - 1), end)
+        windows.append((f"{start.isoformat()}T00:00:00Z", f"{last.isoformat()}T23:59:59Z"))
+        start = last + timedelta(days=1)
+    return windows
+
+
+def backfill(state_name: str, emitted_name: str, projects: dict, start: date, end=None,
+             window_days=WINDOW_DAYS, workers=WORKERS, tags=None, emit_all=False) -> list:
+    """Backfills projects, {project: (measurement, fetch_window)}, from start to end.
+
+    fetch_window(since, until) returns (commits, complete) for one window.
+    Windows are checkpointed in the state file state_name + '_backfill'; an
+    end of None resumes the checkpointed backfill from start, if any, and
+    runs until today otherwise.
+    Saved days outside the range are kept. A project whose windows are not
+    all complete keeps its saved history and emits nothing; run the same
+    backfill again to resume it. Returns the influx lines of the completed
+    projects as an Emission, to commit() once they were written.
+    """
+    checkpoint_name = f"{state_name}_backfill"
+    checkpoints = load_state(checkpoint_name)
+    if end is None:
+        ends = [c['plan'][1] for c in checkpoints.values() if c['plan'][0] == start.isoformat() and c['plan'][2] == window_days]
+        end = date.fromisoformat(max(ends)) if ends else datetime.now(timezone.utc).date()
+    plan = [start.isoformat(), end.isoformat(), window_days]
+    windows = date_windows(start, end, window_days)
+
+    done = {}
+    for project in projects:
+        checkpoint = checkpoints.get(project, {})
+        if checkpoint.get('plan') != plan:
+            checkpoint = {'plan': plan, 'windows': {}}
+        checkpoints[project] = checkpoint
+        done[project] = checkpoint['windows']
+    pending = [(project, since, until) for project in projects for since, until in windows if since not in done[project]]
+    logging.info(f"Backfilling {start} to {end}: {len(pending)} of {len(windows) * len(projects)} windows to fetch")
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(projects[project][1], since, until): (project, since) for project, since, until in pending}
+        for future in as_completed(futures):
+            project, since = futures[future]
+            try:
+                commits, complete = future.result()
+            except Exception as e:
+                logging.error(f"{project}: window from {since} failed: {e}")
+                continue
+            if not complete:
+                logging.warning(f"{project}: window from {since} is incomplete, it will be fetched again")
+                continue
+            done[project][since] = dict(commits)
+            save_state(checkpoint_name, checkpoints)
+
+    state = load_state(state_name)
+    emitted = load_state(emitted_name)
+    lines = []
+    for project, (measurement, _) in projects.items():
+        missing = len(windows) - len(done[project])
+        if missing:
+            logging.warning(f"{project}: {missing} windows still missing, run the backfill again to resume")
+            continue
+        commits = Counter()
+        for window in done[project].values():
+            commits.update(window)
+        # commits near the range edges may fall on a day outside it in the committer's time zone;
+        # the saved count of such a day is the complete one
+        for day, value in state.get(project, {}).get('commits', {}).items():
+            if not start.isoformat() <= day <= end.isoformat():
+                commits[day] = value
+        record_project(state, project, commits)
+        lines.extend(commit_lines(measurement, tags or {}, commits,
+                                  None if emit_all else emitted.setdefault(measurement, {})))
+        lines.extend(rollup_lines(measurement, tags or {}, commits, None if emit_all else emitted))
+        del checkpoints[project]
+
+    save_state(state_name, state)
+    save_state(checkpoint_name, checkpoints)
+    return Emission(lines, None if emit_all else emitted_name, emitted)
+
+
+def add_arguments(parser):
+    "adds the backfill options to the argument parser of a commit collector"
+    parser.add_argument('--backfill', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                        help="fetch the history from this day on in parallel date windows instead of a normal run; "
+                             "an interrupted backfill resumes when started again with the same range")
+    parser.add_argument('--until', type=date.fromisoformat, metavar='YYYY-MM-DD',
+                        help="last day of the backfill (default: that of the interrupted backfill being resumed, or today)")
+    parser.add_argument('--window-days', type=int, default=WINDOW_DAYS,
+                        help="days per backfill window (default: %(default)s)")
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help="backfill windows fetched at once (default: %(default)s)")
+
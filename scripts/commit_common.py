@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"Helpers shared by the GitHub and GitLab commit collectors."
+
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+from line_protocol import format_line
+from sle_state import save_state
+
+
+class Emission(list):
+    """The influx lines of a commit collector run, with the record of emitted values they were checked against.
+
+    The record is saved by commit(), which the caller runs once the lines were
+    written: a record saved before would keep any point lost in between, by a
+    killed process or an abandoned source, from ever being sent again.
+    """
+
+    def __init__(self, lines=(), emitted_name=None, emitted=None):
+        super().__init__(lines)
+        self.emitted_name = emitted_name
+        self.emitted = emitted
+
+    def commit(self):
+        "saves the emitted record, if the run kept one"
+        if self.emitted_name and self.emitted is not None:
+            save_state(self.emitted_name, self.emitted)
+
+
+def commit_emitted(results):
+    "commits the Emission among results, the outputs of collectors whose lines were just written"
+    for result in results:
+        if isinstance(result, Emission):
+            result.commit()
+
+
+def to_timestamp(source_date: str) -> int:
+    "converts a date in format 2022-04-25 to unix nanosecond timestamp required by influxdb"
+    return int(datetime.strptime(source_date, "%Y-%m-%d").timestamp() * 1E9)
+
+
+def resume_point(state: dict, project: str, full: bool = False):
+    """Returns (cursor, since, stored) for an incremental fetch of project.
+
+    cursor is the last day seen on the previous run; that day is fetched again
+    because it may have been incomplete. since is one day earlier so that
+    committer time zones cannot push commits of the cursor day out of the
+    window. stored holds the saved per-day counts strictly before cursor.
+    All three are empty when there is no saved state or full is set.
+    """
+    entry = state.get(project) or {}
+    cursor = entry.get('cursor')
+    if full or not cursor:
+        return None, None, Counter()
+    since_day = datetime.strptime(cursor, "%Y-%m-%d") - timedelta(days=1)
+    stored = Counter({day: value for day, value in entry.get('commits', {}).items() if day < cursor})
+    return cursor, since_day.strftime("%Y-%m-%dT00:00:00Z"), stored
+
+
+def merge_counts(stored: Counter, fetched: Counter, cursor) -> Counter:
+    "adds freshly fetched days from cursor onwards to the stored counts"
+    commits = Counter(stored)
+    for day, value in fetched.items():
+        if cursor is None or day >= cursor:
+            commits[day] += value
+    return commits
+
+
+# periods of the rollups emitted next to the daily points, as measurements <measurement>_<period>
+ROLLUPS = ('weekly', 'monthly')
+
+
+def period_start(day: str, period: str) -> str:
+    "returns the first day of the week (Monday) or month which day belongs to"
+    start = date.fromisoformat(day)
+    if period == 'weekly':
+        return (start - timedelta(days=start.weekday())).isoformat()
+    return start.replace(day=1).isoformat()
+
+
+def rollups(commits: Counter) -> dict:
+    """Totals the per-day counts by ROLLUPS period in one pass over the sorted days.
+
+    Returns {period: {period start: [commits, cumulative]}}, cumulative being
+    all commits up to the end of the period.
+    """
+    totals = {period: {} for period in ROLLUPS}
+    cumulative = 0
+    for day, value in sorted(commits.items()):
+        cumulative += value
+        for period in ROLLUPS:
+            entry = totals[period].setdefault(period_start(day, period), [0, 0])
+            entry[0] += value
+            entry[1] = cumulative
+    return totals
+
+
+def record_project(state: dict, project: str, commits: Counter):
+    """Saves commits as the new per-day history of project in state.
+
+    The cursor is the newest day, but never later than today (UTC): a commit
+    dated in the future by a wrong clock would otherwise hold back every
+    real commit until that date.
+    """
+    if commits:
+        today = datetime.now(timezone.utc).date().isoformat()
+        state[project] = {'cursor': min(max(commits), today), 'commits': dict(sorted(commits.items()))}
+
+
+def partial_days(fetched: Counter, cursor, complete: bool) -> set:
+    """Returns the days whose counts an interrupted newest-first walk may have cut short.
+
+    That is the oldest day the walk reached, unless it lies before cursor and
+    is taken from the stored counts; a complete walk has none.
+    """
+    if complete or not fetched:
+        return set()
+    oldest = min(fetched)
+    return {oldest} if cursor is None or oldest >= cursor else set()
+
+
+def commit_lines(measurement: str, tags: dict, commits: Counter, emitted=None, partial=()) -> list:
+    """Returns the per-day commit counts as influx lines, oldest first.
+
+    emitted is the record of what was emitted before for this measurement
+    ({day: value}); when given, only new or changed days are returned and the
+    record is updated in place. The field stays a float, like the points
+    written so far. Days in partial get a partial=true field and are emitted
+    again, with partial=false, once their count is final; without a record
+    every final line carries partial=false.
+    """
+    lines = []
+    for day, value in sorted(commits.items()):
+        fields = {'commits': float(value)}
+        if day in partial:
+            fields['partial'] = True
+            if emitted is not None:
+                emitted[day] = None
+        elif emitted is None:
+            fields['partial'] = False
+        else:
+            if emitted.get(day) == value:
+                continue
+            if day in emitted and emitted[day] is None:
+                fields['partial'] = False
+            emitted[day] = value
+        lines.append(format_line(measurement, tags, fields, to_timestamp(day)))
+    return lines
+
+
+def rollup_lines(measurement: str, tags: dict, commits: Counter, emitted=None) -> list:
+    """Returns the weekly and monthly rollups of commits as influx lines, see rollups.
+
+    Each period goes to its own measurement, <measurement>_weekly and
+    <measurement>_monthly, with float commits and cumulative fields, stamped
+    with the period start. emitted is the collector's whole record of emitted
+    values; when given, only new or changed periods are returned.
+    """
+    lines = []
+    for period, points in rollups(commits).items():
+        period_measurement = f"{measurement}_{period}"
+        record = None if emitted is None else emitted.setdefault(period_measurement, {})
+        for start, values in points.items():
+            if record is not None:
+                if record.get(start) == values:
+                    continue
+                record[start] = values
+            lines.append(format_line(period_measurement, tags,
+                                     {'commits': float(values[0]), 'cumulative': float(values[1])}, to_timestamp(start)))
+    return lines
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""Confluence page access with a local cache shared by all collector processes.
+
+Pages go through one keep-alive session with connect and read timeouts, and
+several pages can be fetched concurrently with get_pages. Requests are retried
+and skipped while Confluence is down through resilience.call; a cached page
+served in place of a fresh one is a resilience.Stale.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+
+import resilience
+from sle_state import STATE_DIR, locked, write_json
+
+CACHE_DIR = os.path.join(STATE_DIR, 'confluence')
+
+# seconds a cached page is used without asking Confluence whether it changed
+CACHE_TTL = int(os.environ.get('SLE_PERF_CONFLUENCE_TTL', '3600'))
+
+# seconds to keep serving the cached page after Confluence failed, before trying again
+FAILURE_BACKOFF = 300
+
+# seconds to connect and to wait for data
+TIMEOUT = (5, 30)
+
+# pages fetched at once, and connections kept open to Confluence
+MAX_CONCURRENCY = 4
+
+session = requests.Session()
+session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY))
+session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENCY))
+
+
+def page_id(url: str):
+    match = re.search(r'/content/(\d+)', urlsplit(url).path)
+    return match.group(1) if match else None
+
+
+def with_expand(url: str, expand: str) -> str:
+    "returns url with expand added to its 'expand' query parameter"
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    expands = [e for e in query.get('expand', '').split(',') if e]
+    if expand not in expands:
+        expands.append(expand)
+    query['expand'] = ','.join(expands)
+    return urlunsplit(parts._replace(query=urlencode(query, safe=',')))
+
+
+def with_body(url: str, representation: str) -> str:
+    "returns url expanding the body only in representation, e.g. storage instead of the heavier rendered view"
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    expands = [e for e in query.get('expand', '').split(',') if e and not e.startswith('body.')]
+    query['expand'] = ','.join(expands + [f"body.{representation}"])
+    return urlunsplit(parts._replace(query=urlencode(query, safe=',')))
+
+
+def version_url(url: str) -> str:
+    "returns the URL asking only for the version of the page behind url"
+    parts = urlsplit(url)
+    path = re.sub(r'(/content/\d+).*', r'\1', parts.path)
+    return urlunsplit(parts._replace(path=path, query='expand=version'))
+
+
+def read_entry(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def fetch_json(url: str, auth) -> dict:
+    response = session.get(url, auth=auth, timeout=TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_page(url: str, auth, ttl=CACHE_TTL, collector=None) -> dict:
+    """Returns the decoded Confluence REST response of url, from the cache when possible.
+
+    Within ttl the cached page is returned as is. After that, only the page
+    version is requested and the page is downloaded again when it changed.
+    Refreshes are serialised with a lock file, so concurrent collectors wait
+    for one download instead of all fetching the same page. When Confluence
+    fails, or its circuit breaker is open, the last cached page is served as
+    a resilience.Stale, and for FAILURE_BACKOFF seconds before anyone tries
+    again; without a cached page the error is raised. Retries count towards
+    the metrics of collector.
+    """
+    # one entry per page and representation
+    digest = hashlib.sha256(url.encode()).hexdigest()
+    key = f"{page_id(url)}-{digest[:12]}" if page_id(url) else digest
+    path = os.path.join(CACHE_DIR, f"{key}.json")
+
+    entry = read_entry(path)
+    if entry.get('url') == url and time.time() - entry.get('checked_at', 0) < ttl:
+        return entry['page']
+
+    with locked(path + '.lock'):
+        # another collector may have refreshed the page while we waited
+        entry = read_entry(path)
+        if entry.get('url') != url:
+            entry = {}
+        now = time.time()
+        if entry and now - entry.get('checked_at', 0) < ttl:
+            return entry['page']
+        if now - entry.get('failed_at', 0) < FAILURE_BACKOFF:
+            if entry.get('page'):
+                logging.warning(f"Confluence failed recently, serving cached page {key}")
+                return resilience.Stale(entry['page'])
+            raise requests.exceptions.ConnectionError(f"Confluence failed recently, not retrying page {key} yet")
+
+        try:
+            if entry.get('page') and page_id(url):
+                version = resilience.call('confluence', fetch_json, version_url(url), auth, collector=collector)
+                if version.get('version', {}).get('number') == entry.get('version'):
+                    logging.info(f"Confluence page {key} unchanged at version {entry.get('version')}")
+                    entry['checked_at'] = now
+                    write_json(path, entry)
+                    return entry['page']
+
+            page = resilience.call('confluence', fetch_json, with_expand(url, 'version'), auth, collector=collector)
+        except (requests.exceptions.RequestException, ValueError, resilience.CircuitOpen) as err:
+            entry.update({'url': url, 'failed_at': now})
+            write_json(path, entry)
+            if entry.get('page'):
+                logging.warning(f"Confluence request failed ({err}), serving cached page {key}")
+                return resilience.Stale(entry['page'])
+            raise
+
+        logging.info(f"Downloaded Confluence page {key}")
+        write_json(path, {'url': url, 'version': page.get('version', {}).get('number'), 'checked_at': now, 'page': page})
+        return page
+
+
+def get_pages(urls, auth, ttl=CACHE_TTL, collector=None) -> dict:
+    """Fetches urls concurrently through get_page.
+
+    Returns {url: page}, or the exception get_page raised in place of the page.
+    """
+    urls = list(dict.fromkeys(urls))
+    pages = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(len(urls), MAX_CONCURRENCY))) as pool:
+        futures = {url: pool.submit(get_page, url, auth, ttl, collector) for url in urls}
+        for url, future in futures.items():
+            try:
+                pages[url] = future.result()
+            except Exception as err:
+                pages[url] = err
+    return pages
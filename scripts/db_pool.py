@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"Small MySQL connection pool shared by the database collectors."
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+
+# connections idle for longer than this are closed instead of reused
+MAX_IDLE_SECONDS = 300
+
+# connections idle for longer than this are pinged before being handed out
+PING_AFTER_SECONDS = 30
+
+# seconds to connect, and to wait for a query's results or for a write to go through;
+# pymysql waits forever by default
+CONNECT_TIMEOUT = int(os.environ.get('SLE_PERF_DB_CONNECT_TIMEOUT', '10'))
+READ_TIMEOUT = int(os.environ.get('SLE_PERF_DB_READ_TIMEOUT', '90'))
+WRITE_TIMEOUT = int(os.environ.get('SLE_PERF_DB_WRITE_TIMEOUT', '30'))
+
+
+class ConnectionPool:
+    """Hands out connections made by connect(), keeping up to max_size of them open.
+
+    Connections are health checked with a ping when they sat idle for a while,
+    and evicted once idle for longer than max_idle seconds. stats counts the
+    time spent setting connections up and waiting for one to become free.
+    """
+
+    def __init__(self, name, connect, max_size=4, max_idle=MAX_IDLE_SECONDS, ping_after=PING_AFTER_SECONDS):
+        self.name = name
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.ping_after = ping_after
+        self._idle = []  # (connection, returned at), most recently returned last
+        self._size = 0
+        self._cond = threading.Condition()
+        self.stats = {'connects': 0, 'connect_seconds': 0.0, 'checkouts': 0, 'wait_seconds': 0.0,
+                      'evictions': 0, 'failed_pings': 0}
+
+    def _evict_idle(self, now):
+        while self._idle and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.pop(0)
+            self._discard(conn)
+            self.stats['evictions'] += 1
+
+    def _discard(self, conn):
+        self._size -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._evict_idle(now)
+                if self._idle:
+                    conn, returned = self._idle.pop()
+                    if now - returned <= self.ping_after or self._ping(conn):
+                        break
+                    self._discard(conn)
+                    continue
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                self._cond.wait()
+            self.stats['checkouts'] += 1
+            self.stats['wait_seconds'] += time.monotonic() - start
+
+        if conn is None:
+            connect_start = time.monotonic()
+            try:
+                conn = self._connect()
+            except BaseException:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self.stats['connects'] += 1
+                self.stats['connect_seconds'] += time.monotonic() - connect_start
+        return conn
+
+    def _ping(self, conn):
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception as e:
+            logging.info(f"{self.name}: dropping stale connection: {e}")
+            self.stats['failed_pings'] += 1
+            return False
+
+    def _checkin(self, conn, broken=False):
+        with self._cond:
+            if broken:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        "checks a connection out for the duration of the with block; uncommitted work is rolled back"
+        conn = self._checkout()
+        broken = False
+        try:
+            yield conn
+        except BaseException as e:
+            broken = isinstance(e, pymysql.OperationalError)
+            raise
+        finally:
+            if not broken:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            self._checkin(conn, broken)
+
+    def close(self):
+        with self._cond:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def mysql_pool(name, host, user, password, db, **kwargs) -> ConnectionPool:
+    "returns the process-wide pool called name, creating it on first use; kwargs go to pymysql.connect"
+    kwargs = {'connect_timeout': CONNECT_TIMEOUT, 'read_timeout': READ_TIMEOUT, 'write_timeout': WRITE_TIMEOUT, **kwargs}
+    with pools_lock:
+        if name not in pools:
+            pools[name] = ConnectionPool(
+                name, lambda: pymysql.connect(host=host, user=user, password=password, db=db, **kwargs))
+        return pools[name]
+
+
+def pool_stats() -> dict:
+    "returns a copy of the stats of every pool, keyed by pool name"
+    with pools_lock:
+        return {name: dict(pool.stats) for name, pool in pools.items()}
+
+
+def close_pools():
+    with pools_lock:
+        for pool in pools.values():
+            pool.close()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Commit counting from local git mirrors, for the commit collectors.
+
+Each repository is kept as a bare, blobless mirror (git clone --mirror
+--filter=blob:none) under MIRROR_DIR and brought up to date with one
+incremental fetch per run. Commits per day are then counted in a single
+streaming pass over git log of the default branch, without any API paging.
+"""
+
+import base64
+import logging
+import os
+import re
+import shutil
+import subprocess
+from collections import Counter
+
+from sle_state import STATE_DIR, locked
+
+MIRROR_DIR = os.environ.get('SLE_PERF_GIT_MIRROR_DIR', os.path.join(STATE_DIR, 'git-mirrors'))
+
+# seconds a clone or fetch may take
+GIT_TIMEOUT = int(os.environ.get('SLE_PERF_GIT_TIMEOUT', '600'))
+
+
+def git_env(token=None, ssl_verify=True) -> dict:
+    """Returns the environment for git commands: no prompts, and the token as an HTTP header.
+
+    The header goes through GIT_CONFIG_* so that the token neither shows in
+    the process list nor ends up in the mirror's config.
+    """
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+    settings = []
+    if token:
+        credentials = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+        settings.append(('http.extraHeader', f"Authorization: Basic {credentials}"))
+    if not ssl_verify:
+        settings.append(('http.sslVerify', 'false'))
+    env['GIT_CONFIG_COUNT'] = str(len(settings))
+    for i, (key, value) in enumerate(settings):
+        env[f"GIT_CONFIG_KEY_{i}"] = key
+        env[f"GIT_CONFIG_VALUE_{i}"] = value
+    return env
+
+
+def mirror_path(name: str) -> str:
+    "returns the mirror directory of the repository called name, e.g. github/SUSE/qa-testsuites"
+    return os.path.join(MIRROR_DIR, re.sub(r'[^\w.-]', '_', name) + '.git')
+
+
+def update_mirror(name: str, url, env=None) -> str:
+    """Clones the mirror of name from url, or fetches into the existing one; returns its path.
+
+    url may be a callable, which is only called when the mirror has to be
+    cloned. Concurrent collectors wait for each other on a lock file.
+    """
+    path = mirror_path(name)
+    with locked(path + '.lock'):
+        if os.path.isdir(path):
+            subprocess.run(['git', '-C', path, 'fetch', '--prune', '--quiet'],
+                           env=env, check=True, timeout=GIT_TIMEOUT, stdin=subprocess.DEVNULL)
+        else:
+            url = url() if callable(url) else url
+            logging.info(f"Cloning a mirror of {name} from {url}")
+            # left over by an interrupted clone
+            shutil.rmtree(path + '.tmp', ignore_errors=True)
+            subprocess.run(['git', 'clone', '--mirror', '--filter=blob:none', '--quiet', url, path + '.tmp'],
+                           env=env, check=True, timeout=GIT_TIMEOUT, stdin=subprocess.DEVNULL)
+            os.replace(path + '.tmp', path)
+        # keeps git log fast on very large histories; --split only adds the new commits
+        subprocess.run(['git', '-C', path, 'commit-graph', 'write', '--reachable', '--split', '--no-progress'],
+                       env=env, check=False, timeout=GIT_TIMEOUT, stdin=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return path
+
+
+def count_commits(path: str, since=None, utc=True, until=None) -> Counter:
+    """Counts the commits per committer day on the default branch of the mirror at path.
+
+    With utc the days are taken in UTC, like the dates of the GitHub API;
+    otherwise in the committer's own time zone, like GitLab's committed_date.
+    since and until are ISO times passed on to git log --since and --until.
+    """
+    command = ['git', '-C', path, 'log', '--format=%cd', '--date=format-local:%Y-%m-%d' if utc else '--date=short']
+    if since:
+        command.append(f"--since={since}")
+    if until:
+        command.append(f"--until={until}")
+    command.append('HEAD')
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                          env=dict(os.environ, TZ='UTC')) as process:
+        lines = Counter(process.stdout)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    return Counter({line.decode().strip(): count for line, count in lines.items()})
+
+
+def add_breakdown(path: str, breakdown, utc=True):
+    """Adds the author and changed test areas of every commit in the window of breakdown.
+
+    Reads one git log with --name-only; the mirror has every tree, so no
+    blob is downloaded for it.
+    """
+    command = ['git', '-C', path, 'log', '--format=%x00%cd%x00%an', '--name-only', '--no-renames',
+               '--date=format-local:%Y-%m-%d' if utc else '--date=short', f"--since={breakdown.since}", 'HEAD']
+    day = None
+    paths = []
+    with subprocess.Popen(command, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL,
+                          env=dict(os.environ, TZ='UTC')) as process:
+        for line in process.stdout:
+            line = line.decode(errors='replace').rstrip('\n')
+            if line.startswith('\0'):
+                if day:
+                    breakdown.add_paths(day, paths)
+                _, day, author = line.split('\0', 2)
+                breakdown.add_author(day, author)
+                paths = []
+            elif line:
+                paths.append(line)
+    if day:
+        breakdown.add_paths(day, paths)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+
+def window_fetcher(name: str, url, utc=True, token=None, ssl_verify=True):
+    """Updates the mirror of name once and returns fetch_window(since, until) for commit_backfill.backfill.
+
+    Every window is then a count_commits over the local mirror, rather than a
+    fetch under the mirror's lock per window, which would run the windows one
+    after another. Raises OSError or subprocess.SubprocessError when the
+    update fails.
+    """
+    path = update_mirror(name, url, git_env(token, ssl_verify))
+    return lambda since, until: (count_commits(path, since, utc, until), True)
+
+
+def fetch_commits(name: str, url, since=None, utc=True, token=None, ssl_verify=True, until=None, breakdown=None):
+    """Updates the mirror of name and counts its commits per day, see count_commits.
+
+    Returns (commits, complete) like the API backends; complete is False when
+    git failed, after logging why. Authors and test areas go to breakdown,
+    a heavy_hitters.Breakdown, if given.
+    """
+    try:
+        path = update_mirror(name, url, git_env(token, ssl_verify))
+        if breakdown:
+            add_breakdown(path, breakdown, utc)
+        return count_commits(path, since, utc, until), True
+    except (OSError, subprocess.SubprocessError) as e:
+        logging.warning(f"{name}: could not count commits from the git mirror: {e}")
+        return Counter(), False
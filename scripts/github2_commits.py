@@ -1,37 +1,109 @@
 #!/usr/bin/env python3
 
-from datetime import datetime
-from collections import Counter
+import argparse
+import os
 import requests
 from socket import getfqdn
 
-PROJECTS = ['os-autoinst/os-autoinst-distri-opensuse']
+import collector_metrics
+import commit_backfill
+from commit_common import Emission, commit_lines, partial_days, resume_point, merge_counts, record_project, rollup_lines
+from github_api import BACKENDS, TokenPool, fetch_history, git_window_fetcher
+from heavy_hitters import Breakdown
+from line_protocol import write_lines
+from sle_state import load_state, save_state
 
-BASE_API_URL = "https://api.github.com/repos"
+PROJECTS = ['os-autoinst/os-autoinst-distri-opensuse']
 
+# optional for public projects, comma separated; with a token the history is read through GraphQL
+GITHUB_TOKENS = os.environ.get('GITHUB_TOKEN', '').split(',')
 
-def to_timestamp(source_date: str) -> float:
-    return int(datetime.strptime(source_date, "%Y-%m-%d").timestamp() * 1E9)
+COLLECTOR = 'github2_commits'
+STATE_NAME = 'github2_commits'
+EMITTED_NAME = 'github2_commits_emitted'
 
 session = requests.Session()
 hostname = getfqdn()
+collector_metrics.instrument_session(session, COLLECTOR)
+
+
+def collect(full=False, emit_all=False, backend='auto', breakdown=False):
+    """Returns the commits per day of PROJECTS as influx lines, only new or changed days unless emit_all.
+
+    The lines are an Emission; commit() it once they were written.
+
+    With breakdown, the top authors (and test areas, with the git backend) of
+    the last weeks are added, see heavy_hitters.
+    """
+    metrics = collector_metrics.begin(COLLECTOR)
+    lines = []
+    with metrics.phase('state'):
+        state = load_state(STATE_NAME)
+        emitted = load_state(EMITTED_NAME)
+    tokens = TokenPool(GITHUB_TOKENS)
+    for pj_name in PROJECTS:
+        cursor, since, stored = resume_point(state, pj_name, full)
+        sketch = Breakdown() if breakdown else None
+        if sketch and since:
+            since = min(since, sketch.since)
+        with metrics.phase('api_paging'):
+            fetched, complete = fetch_history(session, pj_name, tokens, since, backend, breakdown=sketch)
+        metrics.count('commits_fetched', sum(fetched.values()))
+        commits = merge_counts(stored, fetched, cursor)
+        if complete:
+            record_project(state, pj_name, commits)
+
+        measurement = pj_name.replace('/', '_')
+        lines.extend(commit_lines(measurement, {'machine': hostname}, commits,
+                                  None if emit_all else emitted.setdefault(measurement, {}),
+                                  partial_days(fetched, cursor, complete)))
+        if complete:
+            lines.extend(rollup_lines(measurement, {'machine': hostname}, commits, None if emit_all else emitted))
+            if sketch:
+                lines.extend(sketch.lines(measurement, {'machine': hostname}, None if emit_all else emitted))
+    metrics.add_time('rate_limit_wait', tokens.waited)
+    with metrics.phase('state'):
+        save_state(STATE_NAME, state)
+    return Emission(lines + collector_metrics.lines(COLLECTOR), None if emit_all else EMITTED_NAME, emitted)
+
+
+def backfill(start, end=None, window_days=commit_backfill.WINDOW_DAYS, workers=commit_backfill.WORKERS,
+             backend='auto', emit_all=False):
+    """Backfills PROJECTS from start to end in parallel date windows, see commit_backfill.backfill.
+
+    The git backend updates each mirror once and counts the windows from it.
+    """
+    tokens = TokenPool(GITHUB_TOKENS)
+    if backend == 'git':
+        projects = {pj_name: (pj_name.replace('/', '_'), git_window_fetcher(pj_name, tokens)) for pj_name in PROJECTS}
+    else:
+        projects = {pj_name: (pj_name.replace('/', '_'),
+                              lambda since, until, pj_name=pj_name: fetch_history(session, pj_name, tokens, since, backend, until))
+                    for pj_name in PROJECTS}
+    return commit_backfill.backfill(STATE_NAME, EMITTED_NAME, projects, start, end, window_days, workers,
+                                    {'machine': hostname}, emit_all)
 
-for pj_name in PROJECTS:
-    current_page = 1
-    commits = Counter()
-    while True:
-        url = f"{BASE_API_URL}/{pj_name}/commits?page={current_page}&per_page=100"
-        data = session.get(url, timeout=30)
-        json_data = data.json()
-        if not json_data or 'message' in json_data:
-            break
 
-        for entry in json_data:
-            day = entry['commit']['committer']['date'][:10]
-            commits[day] += 1
+def main():
+    parser = argparse.ArgumentParser(description="Print commits per day of public GitHub projects as influx line protocol.")
+    parser.add_argument('--full', action='store_true', help="ignore the saved cursor and walk the whole history")
+    parser.add_argument('--all', action='store_true', dest='emit_all',
+                        help="emit every day, not only the days which are new or changed since the last run")
+    parser.add_argument('--backend', choices=BACKENDS, default='auto',
+                        help="read the history through the REST or GraphQL API or from a local git mirror; "
+                             "auto uses GraphQL when there is a token (default: %(default)s)")
+    parser.add_argument('--breakdown', action='store_true',
+                        help="also emit the weekly top authors (and test areas, with the git backend) of the last weeks")
+    commit_backfill.add_arguments(parser)
+    args = parser.parse_args()
 
-        current_page += 1
+    if args.backfill:
+        lines = backfill(args.backfill, args.until, args.window_days, args.workers, args.backend, args.emit_all)
+    else:
+        lines = collect(args.full, emit_all=args.emit_all, backend=args.backend, breakdown=args.breakdown)
+    write_lines(lines)
+    lines.commit()
 
-    for date, value in commits.items():
-        print(f"{pj_name.replace('/', '_')},machine={hostname}  commits={value} {to_timestamp(date)}")
 
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""Commit history access for the GitHub collectors.
+
+Three backends count the same commits: the REST /commits endpoint, which
+sends the full commit object of every commit, the GraphQL history connection,
+which is asked for committedDate only and needs a token, and a local git
+mirror of the repository (see git_mirror.py).
+
+Requests go through a TokenPool, which spreads them over the configured tokens
+by their X-RateLimit-Remaining / X-RateLimit-Reset, slows down when a token
+is close to running out and waits for a reset only up to a limit; beyond that
+the walk stops and is reported as incomplete.
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+
+import git_mirror
+from http_cache import ResponseCache, get_json
+
+BASE_API_URL = "https://api.github.com/repos"
+GRAPHQL_URL = "https://api.github.com/graphql"
+GIT_BASE_URL = "https://github.com"
+
+BACKENDS = ('auto', 'rest', 'graphql', 'git')
+
+HISTORY_QUERY = """
+query($owner: String!, $name: String!, $since: GitTimestamp, $until: GitTimestamp, $after: String) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history(first: 100, since: $since, until: $until, after: $after) {
+            pageInfo { hasNextPage endCursor }
+            nodes { committedDate }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+# the same with the author of every commit, for breakdowns
+BREAKDOWN_QUERY = HISTORY_QUERY.replace('nodes { committedDate }', 'nodes { committedDate author { name } }')
+
+# pages answered with 304 Not Modified do not count against the rate limit
+response_cache = ResponseCache()
+
+# seconds a collection may spend waiting for rate limit resets before it stops with partial counts
+MAX_RATE_LIMIT_WAIT = float(os.environ.get('GITHUB_MAX_RATE_LIMIT_WAIT', '60'))
+
+# below this share of its X-RateLimit-Limit left (100 of an authenticated 5000), the requests of a token are
+# spread until its reset, but never more than PACING_MAX_SLEEP seconds apart; a run with requests to spare
+# goes at full speed, and the reset wait decides once they are used up
+PACING_SHARE = 0.02
+PACING_MAX_SLEEP = 1.0
+
+# what GitHub last reported per token (None: anonymous): {token: {'remaining': n, 'reset': epoch seconds, 'limit': n}}
+rate_limits = {}
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+def config_tokens(config: dict) -> list:
+    "returns the GitHub tokens of 'sle_config': the github_tokens list and github_token"
+    return [*config.get('github_tokens', []), config.get('github_token')]
+
+
+class TokenPool:
+    "hands out the token with the most requests left, pacing and waiting as the rate limits require"
+
+    def __init__(self, tokens=(), max_wait=MAX_RATE_LIMIT_WAIT):
+        self.tokens = list(dict.fromkeys(token for token in tokens if token)) or [None]
+        self.max_wait = max_wait
+        # all the time slept, and the part of it spent waiting for resets, which max_wait bounds
+        self.waited = 0.0
+        self.reset_waited = 0.0
+
+    @property
+    def authenticated(self) -> bool:
+        return self.tokens != [None]
+
+    def left(self, token, now):
+        "requests token has left before its reset; unknown counts as unlimited"
+        limit = rate_limits.get(token)
+        if not limit or limit['reset'] <= now:
+            return float('inf')
+        return limit['remaining']
+
+    def sleep(self, seconds, reset=True):
+        "sleeps seconds; a wait for a reset raises RateLimitExceeded instead when it would exceed max_wait"
+        if reset and self.reset_waited + seconds > self.max_wait:
+            raise RateLimitExceeded(f"rate limit needs a {seconds:.0f}s wait, "
+                                    f"{self.max_wait - self.reset_waited:.0f}s of the allowed {self.max_wait:.0f}s left")
+        time.sleep(seconds)
+        self.waited += seconds
+        if reset:
+            self.reset_waited += seconds
+
+    def acquire(self):
+        "returns the token for the next request, raising RateLimitExceeded when it cannot be had in time"
+        now = time.time()
+        token = max(self.tokens, key=lambda t: self.left(t, now))
+        remaining = self.left(token, now)
+        if remaining <= 0:
+            token = min(self.tokens, key=lambda t: rate_limits[t]['reset'])
+            logging.info("GitHub rate limit of every token reached, waiting for the reset")
+            self.sleep(rate_limits[token]['reset'] - now + 1)
+        elif remaining < (rate_limits.get(token, {}).get('limit') or 0) * PACING_SHARE:
+            self.sleep(min((rate_limits[token]['reset'] - now) / remaining, PACING_MAX_SLEEP), reset=False)
+        return token
+
+    def update(self, token, response):
+        "records the rate limit state reported with response"
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        limit = response.headers.get('X-RateLimit-Limit')
+        if remaining is not None and reset is not None:
+            rate_limits[token] = {'remaining': int(remaining), 'reset': float(reset),
+                                  'limit': int(limit) if limit is not None else None}
+
+    def exhausted(self, token, response):
+        "marks token as used up after response was refused for the rate limit"
+        retry_after = float(response.headers.get('Retry-After') or 60)
+        reset = float(response.headers.get('X-RateLimit-Reset') or 0)
+        limit = rate_limits.get(token, {}).get('limit')
+        rate_limits[token] = {'remaining': 0, 'reset': max(reset, time.time() + retry_after), 'limit': limit}
+
+    @staticmethod
+    def headers(token, scheme='token') -> dict:
+        return {'Authorization': f"{scheme} {token}"} if token else {}
+
+
+def rate_limited(response, json_data) -> bool:
+    "whether response is GitHub refusing a request for the primary or secondary rate limit"
+    if isinstance(json_data, dict) and any(e.get('type') == 'RATE_LIMITED' for e in json_data.get('errors') or []):
+        return True
+    if response.status_code not in (403, 429):
+        return False
+    message = json_data.get('message', '') if isinstance(json_data, dict) else ''
+    return (response.headers.get('X-RateLimit-Remaining') == '0' or 'Retry-After' in response.headers
+            or 'rate limit' in message.lower())
+
+
+def fetch_commits(session, pj_name: str, tokens=None, since=None, until=None, breakdown=None):
+    """Counts commits per day of pj_name, newest first, optionally only since and until ISO times.
+
+    Returns (commits, complete); complete is False when the walk stopped on an
+    API error or the rate limit, so callers must not treat the counts as final.
+    Commit authors are added to breakdown, a heavy_hitters.Breakdown, if given.
+    """
+    tokens = tokens or TokenPool()
+    current_page = 1
+    commits = Counter()
+    while True:
+        url = f"{BASE_API_URL}/{pj_name}/commits?page={current_page}&per_page=100"
+        if since:
+            url += f"&since={since}"
+        if until:
+            url += f"&until={until}"
+        try:
+            token = tokens.acquire()
+        except RateLimitExceeded as e:
+            logging.warning(f"{pj_name}: GitHub API stopped at page {current_page}: {e}")
+            return commits, False
+        json_data, response = get_json(session, url, response_cache, headers=tokens.headers(token), timeout=30)
+        tokens.update(token, response)
+        if rate_limited(response, json_data):
+            tokens.exhausted(token, response)
+            continue
+
+        # Stop if we reach the end or hit an API issue
+        if not json_data:
+            return commits, True
+        if 'message' in json_data:
+            logging.warning(f"{pj_name}: GitHub API stopped at page {current_page}: {json_data['message']}")
+            return commits, False
+
+        for entry in json_data:
+            day = entry['commit']['committer']['date'][:10]
+            commits[day] += 1
+            if breakdown:
+                breakdown.add_author(day, entry['commit']['author']['name'])
+
+        current_page += 1
+
+
+def fetch_commits_graphql(session, pj_name: str, tokens, since=None, until=None, breakdown=None):
+    """Counts commits per day of the default branch of pj_name through GraphQL, like fetch_commits.
+
+    tokens must hold at least one token. Returns (commits, complete), complete
+    being False when a page failed or the rate limit stopped the walk.
+    """
+    owner, name = pj_name.split('/', 1)
+    variables = {'owner': owner, 'name': name, 'since': since, 'until': until, 'after': None}
+    commits = Counter()
+    while True:
+        try:
+            token = tokens.acquire()
+        except RateLimitExceeded as e:
+            logging.warning(f"{pj_name}: GitHub GraphQL API stopped after {sum(commits.values())} commits: {e}")
+            return commits, False
+        response = session.post(GRAPHQL_URL, json={'query': BREAKDOWN_QUERY if breakdown else HISTORY_QUERY,
+                                                    'variables': variables},
+                                headers=tokens.headers(token, 'bearer'), timeout=30)
+        try:
+            json_data = response.json()
+        except ValueError:
+            json_data = {'message': f"HTTP {response.status_code}"}
+        tokens.update(token, response)
+        if rate_limited(response, json_data):
+            tokens.exhausted(token, response)
+            continue
+        if response.status_code != 200 or json_data.get('errors') or 'message' in json_data:
+            message = json_data.get('message') or '; '.join(e.get('message', '') for e in json_data.get('errors', []))
+            logging.warning(f"{pj_name}: GitHub GraphQL API stopped after {sum(commits.values())} commits: {message}")
+            return commits, False
+
+        branch = (json_data['data']['repository'] or {}).get('defaultBranchRef')
+        if not branch:
+            return commits, True
+        history = branch['target']['history']
+        for node in history['nodes']:
+            commits[node['committedDate'][:10]] += 1
+            if breakdown:
+                breakdown.add_author(node['committedDate'][:10], (node.get('author') or {}).get('name'))
+
+        if not history['pageInfo']['hasNextPage']:
+            return commits, True
+        variables['after'] = history['pageInfo']['endCursor']
+
+
+def git_window_fetcher(pj_name: str, tokens=None):
+    "updates the git mirror of pj_name and returns a fetch_window(since, until) counting from it, for backfills"
+    tokens = tokens or TokenPool()
+    return git_mirror.window_fetcher(f"github/{pj_name}", f"{GIT_BASE_URL}/{pj_name}.git", utc=True, token=tokens.tokens[0])
+
+
+def fetch_history(session, pj_name: str, tokens=None, since=None, backend='auto', until=None, breakdown=None):
+    """Counts commits per day of pj_name with backend, see fetch_commits.
+
+    'auto' uses GraphQL when tokens holds a token and REST otherwise; 'graphql'
+    without a token falls back to REST as well. 'git' counts from a mirror
+    cloned from GIT_BASE_URL, which may also be a local directory, and is the
+    only one adding test areas to breakdown besides authors.
+    """
+    tokens = tokens or TokenPool()
+    if backend == 'git':
+        return git_mirror.fetch_commits(f"github/{pj_name}", f"{GIT_BASE_URL}/{pj_name}.git", since,
+                                        utc=True, token=tokens.tokens[0], until=until, breakdown=breakdown)
+    if backend != 'rest' and tokens.authenticated:
+        return fetch_commits_graphql(session, pj_name, tokens, since, until, breakdown)
+    if backend == 'graphql':
+        logging.warning(f"{pj_name}: no GitHub token for the GraphQL API, using REST")
+    return fetch_commits(session, pj_name, tokens, since, until, breakdown)
@@ -1,38 +1,220 @@
 #!/usr/bin/env python3
 
-from datetime import datetime
+import argparse
+import logging
+import os
+import threading
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 from socket import getfqdn
 
+import collector_metrics
+import commit_backfill
+import git_mirror
+import resilience
+from commit_common import Emission, commit_lines, resume_point, merge_counts, record_project, rollup_lines
+from heavy_hitters import Breakdown
+from line_protocol import write_lines
+from sle_state import load_state, save_state
+
 #Project_C = vt-perf-auto
 #Project_D = SLEPerf
 PROJECTS = {'Project_C': 5575, 'Project_D':6354}
 
 BASE_API_URL = "https://gitlab.suse.de/api/v4"
 
+COLLECTOR = 'gitlab_commits'
+STATE_NAME = 'gitlab_commits'
+EMITTED_NAME = 'gitlab_commits_emitted'
+
+PER_PAGE = 100
 
-def to_timestamp(source_date: str) -> float:
-    "converts a date in format 2022-04-25 to unix nanosecond timestamp required by influxdb"
-    return int(datetime.strptime(source_date, "%Y-%m-%d").timestamp()*1E9)
+BACKENDS = ('api', 'git')
+
+# upper bound of requests in flight against gitlab.suse.de, across all projects
+MAX_CONCURRENCY = int(os.environ.get('GITLAB_CONCURRENCY', '4'))
 
 hostname = getfqdn()
 
 session = requests.Session()
-for pj_name, pj_id in PROJECTS.items():
-    current_page = 0
+collector_metrics.instrument_session(session, COLLECTOR)
+request_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+request_limit = None
+
+
+def set_concurrency(limit: int):
+    "resizes the request limit and the session connection pool to limit parallel requests"
+    global request_slots, request_limit
+    if limit == request_limit:
+        # keep the pooled connections of a long-running process warm
+        return
+    request_limit = limit
+    request_slots = threading.BoundedSemaphore(limit)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=limit)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+def get(url):
+    "requests url, retried and skipped while gitlab.suse.de is down through resilience.call"
+    def attempt():
+        # the slot is not held while waiting for a retry
+        with request_slots:
+            data = session.get(url, timeout=30, verify=False)
+        data.raise_for_status()
+        return data
+    return resilience.call('gitlab', attempt, collector=COLLECTOR)
+
+
+def fetch_page(pj_id, page, since=None, until=None):
+    url = f"{BASE_API_URL}/projects/{pj_id}/repository/commits?page={page}&per_page={PER_PAGE}"
+    if since:
+        url += f"&since={since}"
+    if until:
+        url += f"&until={until}"
+    return get(url)
+
+
+def count_page(data, commits: Counter, breakdown=None):
+    for entry in data.json():
+        day = entry['committed_date'][:10]
+        commits[day] += 1
+        if breakdown:
+            breakdown.add_author(day, entry.get('author_name'))
+
+
+def fetch_commits(pj_id, since=None, page_pool=None, until=None, breakdown=None):
+    """Counts commits per day of project pj_id, optionally only those committed since and until ISO times.
+
+    The first page tells how many pages there are (X-Total-Pages); the rest are
+    fetched through page_pool. GitLab leaves the totals out on very large
+    collections, in which case the pages are followed one by one via X-Next-Page.
+    Commit authors are added to breakdown, a heavy_hitters.Breakdown, if given.
+    """
+    first = fetch_page(pj_id, 1, since, until)
     commits = Counter()
-    while True:
-        current_page += 1
-        url = f"{BASE_API_URL}/projects/{pj_id}/repository/commits?page={current_page}"
-        data = session.get(url, timeout=30, verify=False)
-        for entry in data.json():
-            day = entry['committed_date'][:10]
-            commits[day] += 1
-        # loop until header 'X-Next-Page' is empty
-        if data.headers['X-Next-Page'] == '':
-            break
-    for date, value in commits.items():
-        print(f"{pj_name},machine={hostname} commits={value} {to_timestamp(date)}")
+    count_page(first, commits, breakdown)
+
+    total_pages = first.headers.get('X-Total-Pages')
+    if total_pages and page_pool is not None:
+        for data in page_pool.map(lambda page: fetch_page(pj_id, page, since, until), range(2, int(total_pages) + 1)):
+            count_page(data, commits, breakdown)
+        return commits
+
+    next_page = first.headers.get('X-Next-Page')
+    # loop until header 'X-Next-Page' is empty
+    while next_page:
+        data = fetch_page(pj_id, next_page, since, until)
+        count_page(data, commits, breakdown)
+        next_page = data.headers.get('X-Next-Page')
+    return commits
+
+
+def repository_url(pj_id) -> str:
+    "returns the HTTP clone URL of project pj_id"
+    return get(f"{BASE_API_URL}/projects/{pj_id}").json()['http_url_to_repo']
+
+
+def fetch_commits_git(pj_name, pj_id, since=None, until=None, breakdown=None):
+    "counts commits per day of project pj_id from its local git mirror, in committer time like committed_date"
+    commits, complete = git_mirror.fetch_commits(f"gitlab/{pj_name}", lambda: repository_url(pj_id), since,
+                                                 utc=False, ssl_verify=False, until=until, breakdown=breakdown)
+    if not complete:
+        raise RuntimeError("git mirror update failed")
+    return commits
+
+
+def collect(full=False, concurrency=MAX_CONCURRENCY, emit_all=False, backend='api', breakdown=False):
+    """Returns the commits per day of PROJECTS as influx lines, only new or changed days unless emit_all.
+
+    With breakdown, the top authors (and test areas, with the git backend) of
+    the last weeks are added, see heavy_hitters. The lines are an Emission;
+    commit() it once they were written.
+    """
+    set_concurrency(max(1, concurrency))
+    metrics = collector_metrics.begin(COLLECTOR)
+    lines = []
+    with metrics.phase('state'):
+        state = load_state(STATE_NAME)
+        emitted = load_state(EMITTED_NAME)
+    resume = {pj_name: resume_point(state, pj_name, full) for pj_name in PROJECTS}
+    sketches = {pj_name: Breakdown() if breakdown else None for pj_name in PROJECTS}
+    # the breakdown window may reach further back than the cursor
+    since = {pj_name: min(resume[pj_name][1], sketches[pj_name].since) if breakdown and resume[pj_name][1]
+             else resume[pj_name][1] for pj_name in PROJECTS}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as page_pool, \
+            ThreadPoolExecutor(max_workers=len(PROJECTS)) as project_pool:
+        if backend == 'git':
+            futures = {pj_name: project_pool.submit(fetch_commits_git, pj_name, pj_id, since[pj_name],
+                                                    breakdown=sketches[pj_name])
+                       for pj_name, pj_id in PROJECTS.items()}
+        else:
+            futures = {pj_name: project_pool.submit(fetch_commits, pj_id, since[pj_name], page_pool,
+                                                    breakdown=sketches[pj_name])
+                       for pj_name, pj_id in PROJECTS.items()}
+
+        for pj_name, future in futures.items():
+            try:
+                with metrics.phase('api_paging'):
+                    fetched = future.result()
+            except (requests.exceptions.RequestException, ValueError, RuntimeError, resilience.CircuitOpen) as e:
+                logging.error(f"{pj_name}: fetching commits failed: {e}")
+                continue
+            metrics.count('commits_fetched', sum(fetched.values()))
+            cursor, _, stored = resume[pj_name]
+            commits = merge_counts(stored, fetched, cursor)
+            record_project(state, pj_name, commits)
+            lines.extend(commit_lines(pj_name, {'machine': hostname}, commits,
+                                      None if emit_all else emitted.setdefault(pj_name, {})))
+            lines.extend(rollup_lines(pj_name, {'machine': hostname}, commits, None if emit_all else emitted))
+            if sketches[pj_name]:
+                lines.extend(sketches[pj_name].lines(pj_name, {'machine': hostname}, None if emit_all else emitted))
+    with metrics.phase('state'):
+        save_state(STATE_NAME, state)
+    return Emission(lines + collector_metrics.lines(COLLECTOR) + resilience.breaker_lines(('gitlab',)),
+                    None if emit_all else EMITTED_NAME, emitted)
+
+
+def backfill(start, end=None, window_days=commit_backfill.WINDOW_DAYS, workers=commit_backfill.WORKERS,
+             concurrency=MAX_CONCURRENCY, backend='api', emit_all=False):
+    "backfills PROJECTS from start to end in parallel date windows, see commit_backfill.backfill"
+    set_concurrency(max(1, concurrency))
+    if backend == 'git':
+        # each mirror is updated once, the windows are only counted from it
+        projects = {pj_name: (pj_name, git_mirror.window_fetcher(f"gitlab/{pj_name}", lambda pj_id=pj_id: repository_url(pj_id),
+                                                                 utc=False, ssl_verify=False))
+                    for pj_name, pj_id in PROJECTS.items()}
+    else:
+        projects = {pj_name: (pj_name, lambda since, until, pj_id=pj_id: (fetch_commits(pj_id, since, None, until), True))
+                    for pj_name, pj_id in PROJECTS.items()}
+    return commit_backfill.backfill(STATE_NAME, EMITTED_NAME, projects, start, end, window_days, workers,
+                                    {'machine': hostname}, emit_all)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print commits per day of gitlab.suse.de projects as influx line protocol.")
+    parser.add_argument('--full', action='store_true', help="ignore the saved cursor and walk the whole history")
+    parser.add_argument('--all', action='store_true', dest='emit_all',
+                        help="emit every day, not only the days which are new or changed since the last run")
+    parser.add_argument('--concurrency', type=int, default=MAX_CONCURRENCY,
+                        help="maximum number of requests in flight (default: %(default)s, env GITLAB_CONCURRENCY)")
+    parser.add_argument('--backend', choices=BACKENDS, default='api',
+                        help="page the GitLab API, or count from local git mirrors (default: %(default)s)")
+    parser.add_argument('--breakdown', action='store_true',
+                        help="also emit the weekly top authors (and test areas, with the git backend) of the last weeks")
+    commit_backfill.add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.backfill:
+        lines = backfill(args.backfill, args.until, args.window_days, args.workers, args.concurrency, args.backend, args.emit_all)
+    else:
+        lines = collect(args.full, args.concurrency, args.emit_all, args.backend, args.breakdown)
+    write_lines(lines)
+    lines.commit()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Bounded-memory breakdowns of commits by author and by test area.
+
+Every week of a fixed window gets a space-saving sketch of a fixed capacity
+per dimension, so memory and the number of series emitted stay bounded
+however large the history: only the TOP_K heaviest keys of a week are
+emitted, the rest is summed up as 'other'.
+"""
+
+import os
+from datetime import date, timedelta
+
+from commit_common import period_start, to_timestamp
+from line_protocol import format_line
+
+# weeks broken down, counting back from the current one
+BREAKDOWN_WEEKS = int(os.environ.get('SLE_PERF_BREAKDOWN_WEEKS', '12'))
+
+# keys emitted per week and dimension, and keys tracked by each sketch to find them
+TOP_K = int(os.environ.get('SLE_PERF_BREAKDOWN_TOP', '10'))
+SKETCH_CAPACITY = 10 * TOP_K
+
+# paths are counted by their test area: the first directory below this prefix
+PATH_PREFIX = 'tests/'
+
+OTHER = 'other'
+
+
+class SpaceSaving:
+    """The space-saving heavy-hitters sketch: at most capacity counters.
+
+    A key arriving when all counters are taken replaces the smallest one and
+    inherits its count, so counts may be overestimated by at most the
+    smallest count, and every key heavier than total / capacity is kept.
+    """
+
+    def __init__(self, capacity=SKETCH_CAPACITY):
+        self.capacity = capacity
+        self.counts = {}
+        self.total = 0
+
+    def add(self, key, n=1):
+        self.total += n
+        if key in self.counts or len(self.counts) < self.capacity:
+            self.counts[key] = self.counts.get(key, 0) + n
+            return
+        smallest = min(self.counts, key=self.counts.get)
+        self.counts[key] = self.counts.pop(smallest) + n
+
+    def top(self, k=TOP_K) -> dict:
+        "returns the k heaviest keys and their counts, plus OTHER for the rest of the total"
+        top = dict(sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:k])
+        rest = self.total - sum(top.values())
+        if rest > 0:
+            top[OTHER] = rest
+        return top
+
+
+def test_area(path: str):
+    "returns the test area of path, e.g. tests/console for tests/console/zypper.pm, or None outside PATH_PREFIX"
+    if not path.startswith(PATH_PREFIX):
+        return None
+    area, _, rest = path[len(PATH_PREFIX):].partition('/')
+    return PATH_PREFIX + area if rest else PATH_PREFIX.rstrip('/')
+
+
+class Breakdown:
+    "weekly author and test area sketches of the last weeks"
+
+    DIMENSIONS = {'authors': 'author', 'paths': 'path'}
+
+    def __init__(self, weeks=BREAKDOWN_WEEKS, today=None):
+        today = today or date.today()
+        self.first_week = period_start((today - timedelta(weeks=weeks - 1)).isoformat(), 'weekly')
+        self.sketches = {dimension: {} for dimension in self.DIMENSIONS}
+
+    @property
+    def since(self) -> str:
+        "the ISO time a fetch must reach back to for the whole window"
+        return f"{self.first_week}T00:00:00Z"
+
+    def add(self, dimension, day: str, key):
+        week = period_start(day, 'weekly')
+        if week >= self.first_week and key:
+            self.sketches[dimension].setdefault(week, SpaceSaving()).add(key)
+
+    def add_author(self, day: str, name):
+        self.add('authors', day, name)
+
+    def add_paths(self, day: str, paths):
+        "counts a commit once for every test area among paths"
+        for area in {test_area(path) for path in paths}:
+            self.add('paths', day, area)
+
+    def lines(self, measurement: str, tags: dict, emitted=None) -> list:
+        """Returns the top keys of every week as <measurement>_authors / <measurement>_paths lines.
+
+        emitted is the collector's whole record of emitted values; when given,
+        only weeks whose top keys changed are emitted, keys which dropped out
+        of a week's top are set to 0, and weeks older than the window are
+        forgotten.
+        """
+        lines = []
+        for dimension, tag in self.DIMENSIONS.items():
+            dimension_measurement = f"{measurement}_{dimension}"
+            record = None if emitted is None else emitted.setdefault(dimension_measurement, {})
+            for week, sketch in sorted(self.sketches[dimension].items()):
+                top = sketch.top()
+                previous = {} if record is None else record.get(week, {})
+                if record is not None:
+                    if previous == top:
+                        continue
+                    record[week] = top
+                for key in sorted(set(previous) - set(top)):
+                    lines.append(format_line(dimension_measurement, {**tags, tag: key},
+                                             {'commits': 0.0}, to_timestamp(week)))
+                for key, count in top.items():
+                    lines.append(format_line(dimension_measurement, {**tags, tag: key},
+                                             {'commits': float(count)}, to_timestamp(week)))
+            if record is not None:
+                for week in [week for week in record if week < self.first_week]:
+                    del record[week]
+        return lines
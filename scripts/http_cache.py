@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"On-disk cache of HTTP responses revalidated with ETag / Last-Modified."
+
+import hashlib
+import json
+import logging
+import os
+
+from sle_state import STATE_DIR, write_json
+
+CACHE_DIR = os.path.join(STATE_DIR, 'http-cache')
+
+# total size of the cached bodies before the least recently used ones are dropped
+CACHE_MAX_BYTES = int(float(os.environ.get('SLE_PERF_HTTP_CACHE_MB', '64')) * 1024 * 1024)
+
+
+class ResponseCache:
+    """Response bodies keyed by URL, one file per URL, evicted least recently used first.
+
+    Only successful responses carrying an ETag or Last-Modified header are kept,
+    since nothing else can be revalidated.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+    def lookup(self, url: str):
+        "returns the cached entry of url (etag, last_modified, body) or None"
+        if not self.enabled:
+            return None
+        path = self._path(url)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url:
+            return None
+        return entry
+
+    def touch(self, url: str):
+        try:
+            os.utime(self._path(url))
+        except OSError:
+            pass
+
+    def store(self, url: str, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not self.enabled or not (etag or last_modified):
+            return
+        entry = {'url': url, 'etag': etag, 'last_modified': last_modified, 'body': response.text}
+        # written atomically, concurrent runs never see half a file
+        write_json(self._path(url), entry)
+        self.evict()
+
+    def evict(self):
+        "drops the least recently used entries until the cache fits in max_bytes"
+        try:
+            with os.scandir(self.directory) as it:
+                files = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in it if e.name.endswith('.json')]
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def get_json(session, url: str, cache: ResponseCache, headers=None, timeout=30):
+    """GETs url and returns its decoded JSON body, revalidating against cache.
+
+    A cached entry is sent back as If-None-Match / If-Modified-Since; on
+    304 Not Modified the cached body is used. Returns (json_data, response).
+    """
+    entry = cache.lookup(url)
+    request_headers = dict(headers or {})
+    if entry:
+        if entry.get('etag'):
+            request_headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            request_headers['If-Modified-Since'] = entry['last_modified']
+
+    response = session.get(url, headers=request_headers, timeout=timeout)
+    if response.status_code == 304 and entry:
+        logging.debug(f"Not modified, serving {url} from cache")
+        cache.touch(url)
+        return json.loads(entry['body']), response
+
+    json_data = response.json()
+    if response.status_code == 200:
+        cache.store(url, response)
+    return json_data, response
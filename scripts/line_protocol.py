@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"Formatting of influx line protocol with the escaping rules of each element."
+
+import os
+import sys
+
+
+def escape_measurement(name: str) -> str:
+    return str(name).replace('\\', '\\\\').replace(',', '\\,').replace(' ', '\\ ')
+
+
+def escape_key(key: str) -> str:
+    "escapes a tag key, tag value or field key"
+    return str(key).replace('\\', '\\\\').replace(',', '\\,').replace('=', '\\=').replace(' ', '\\ ')
+
+
+def format_field_value(value) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        return repr(value)
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+
+def format_line(measurement: str, tags: dict, fields: dict, timestamp=None) -> str:
+    """Returns one line of line protocol; tags with empty values are left out.
+
+    Integers are written as integer fields (5i); pass floats for float fields.
+    """
+    tag_set = ''.join(f",{escape_key(k)}={escape_key(v)}" for k, v in tags.items() if v not in (None, ''))
+    field_set = ','.join(f"{escape_key(k)}={format_field_value(v)}" for k, v in fields.items())
+    line = f"{escape_measurement(measurement)}{tag_set} {field_set}"
+    return line if timestamp is None else f"{line} {timestamp}"
+
+
+def write_lines(lines, stream=None):
+    "writes lines, newline terminated, to stream (default stdout) with as few write syscalls as possible"
+    if not lines:
+        return
+    stream = stream or sys.stdout
+    stream.flush()
+    data = memoryview(('\n'.join(lines) + '\n').encode())
+    fd = stream.fileno()
+    while data:
+        data = data[os.write(fd, data):]
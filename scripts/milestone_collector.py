@@ -0,0 +1,617 @@
+#!/usr/bin/env python3
+
+import argparse
+import pymysql
+import requests
+from datetime import datetime
+import re
+import logging
+import os
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from socket import getfqdn
+
+import collector_metrics
+import confluence
+import resilience
+from db_pool import mysql_pool, pool_stats, close_pools
+from line_protocol import format_line, write_lines
+from milestone_registry import load_registry, normalise_milestone
+from sle_config import load_sle_config
+from sle_state import load_state, save_state
+
+# Configure the logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+COLLECTOR = 'milestones'
+OUTPUTS = ('mysql', 'influx', 'both')
+collector_metrics.instrument_session(confluence.session, COLLECTOR)
+hostname = getfqdn()
+
+# MySQL named lock held while milestone rows are written, and how long to wait for it (seconds)
+WRITE_LOCK_NAME = 'sle_perf_milestones'
+WRITE_LOCK_TIMEOUT = 30
+
+# incremental mode: local per-role summary of report_view, the 'sle_config' key naming the ever growing report_view
+# column used as watermark (default id), and the hours after which a role is recounted in full to fix any drift
+SUMMARY_STATE = 'milestone_summary'
+WATERMARK_COLUMN_KEY = 'report_view_watermark_column'
+RECONCILE_HOURS = float(os.environ.get('SLE_PERF_RECONCILE_HOURS', '24'))
+
+# external dependencies of a run, each behind its own circuit breaker, see resilience.py
+DEPENDENCIES = ('old_db', 'new_db', 'confluence')
+
+# MySQL error codes worth a retry: the server cannot be reached or dropped the connection (2003, 2006, 2013,
+# 2055), a lock wait timeout or a deadlock (1205, 1213). pymysql raises OperationalError for access denied,
+# unknown databases and columns as well; those are configuration errors and fail at once
+DB_RETRY_CODES = {2003, 2006, 2013, 2055, 1205, 1213}
+
+# roles collected from report_view and where their milestone summaries go, see milestone_registry.py
+ROLES = load_registry()
+
+
+def db_transient(err) -> bool:
+    "tells whether err of an old- or new-db call is worth a retry and counts against its circuit breaker"
+    if isinstance(err, pymysql.OperationalError):
+        return bool(err.args) and err.args[0] in DB_RETRY_CODES
+    return resilience.transient(err)
+
+
+@lru_cache(maxsize=None)
+def bug_count_pattern(milestones):
+    "returns the compiled pattern matching '<name> Total Bugs =<n>' for any of the milestones (a tuple)"
+    # longest names first, so that e.g. RC10 is not taken for RC1
+    names = '|'.join(re.escape(m) for m in sorted(milestones, key=len, reverse=True))
+    return re.compile(rf'(?<![\w.])({names}) Total Bugs =(\d+)')
+
+
+def find_bug_counts(text, milestones):
+    "returns the bug counts of the milestones found in text in a single pass, keyed by lower-case name; the first count wins"
+    bug_counts = {}
+    for match in bug_count_pattern(tuple(milestones)).finditer(text):
+        bug_counts.setdefault(match.group(1).lower(), int(match.group(2)))
+    return bug_counts
+
+
+def parse_bug_counts(text, milestones):
+    """Collects the bug count of every milestone from text in a single pass.
+
+    Returns counts keyed by lower-case milestone name; when a milestone is
+    listed more than once the first count wins. Milestones which are not on
+    the page are logged and counted as 0.
+    """
+    bug_counts = find_bug_counts(text, milestones)
+
+    missing = [m for m in milestones if m.lower() not in bug_counts]
+    if missing:
+        logging.warning(f"No bug count found on the Confluence page for {', '.join(missing)}")
+    for milestone in missing:
+        bug_counts[milestone.lower()] = 0
+    return bug_counts
+
+
+def log_page_error(err):
+    if isinstance(err, requests.exceptions.HTTPError):
+        logging.error(f"HTTP error occurred: {err}")
+    else:
+        logging.error(f"Error occurred: {err}")
+
+#########################################################################################################################################
+#Name:
+#    get_bugs_counts
+#
+#Parameters:
+#    - pages (dict): {key: (confluence_url, milestones)}, the Confluence REST URL of each page holding bug counts and the
+#      milestone names to look for on it.
+#    - confluence_username (str): The username to authenticate with Confluence.
+#    - confluence_password (str): The password associated with the provided Confluence username.
+#
+#Description:
+#    Fetches the bug count for various milestones (versions) from several Confluence pages at once, through the local page
+#    cache and one concurrent request per page. Pages are first asked for their storage format, much lighter than the rendered
+#    body.view; a page whose storage format does not show all its milestones is fetched again rendered, as before.
+#    Each page is scanned once for all milestones, see parse_bug_counts.
+#Returns:
+#    - dict: {key: bug counts keyed by lower-case milestone name}. A page which could not be read, not even from the cache,
+#      gets None and its error logged, so that its milestones are not stored with 0 bugs; counts read from a cached page
+#      served while Confluence is down are a resilience.Stale.
+#
+#Exceptions:
+#    - If there's an HTTP error while fetching data from Confluence, it logs the error message with the prefix "HTTP error occurred:".
+#    - For any other exceptions, it logs the error message with the prefix "Error occurred:".
+#########################################################################################################################################
+def get_bugs_counts(pages, confluence_username, confluence_password):
+    auth = (confluence_username, confluence_password)
+    bug_counts = {}
+    rendered = {}
+    fetched = confluence.get_pages([confluence.with_body(url, 'storage') for url, _ in pages.values()], auth,
+                                   collector=COLLECTOR)
+    for key, (url, milestones) in pages.items():
+        page_data = fetched[confluence.with_body(url, 'storage')]
+        if isinstance(page_data, Exception):
+            log_page_error(page_data)
+            bug_counts[key] = None
+            continue
+        try:
+            found = find_bug_counts(page_data['body']['storage']['value'], milestones)
+        except (KeyError, TypeError):
+            found = {}
+        if {m.lower() for m in milestones} <= set(found):
+            bug_counts[key] = resilience.Stale(found) if resilience.is_stale(page_data) else found
+        else:
+            rendered[key] = confluence.with_body(url, 'view')
+
+    fetched = confluence.get_pages(rendered.values(), auth, collector=COLLECTOR) if rendered else {}
+    for key, url in rendered.items():
+        try:
+            page_data = fetched[url]
+            if isinstance(page_data, Exception):
+                raise page_data
+            found = parse_bug_counts(page_data['body']['view']['value'], pages[key][1])
+            bug_counts[key] = resilience.Stale(found) if resilience.is_stale(page_data) else found
+        except Exception as err:
+            log_page_error(err)
+            bug_counts[key] = None
+    return bug_counts
+
+
+def get_bugs_count(confluence_url, confluence_username, confluence_password, milestones):
+    "returns the bug counts of milestones on the Confluence page at confluence_url, or None, see get_bugs_counts"
+    return get_bugs_counts({None: (confluence_url, milestones)}, confluence_username, confluence_password)[None]
+
+#########################################################################################################################################
+#Name:
+#   existing_milestones
+#
+#Parameters:
+#   - new_cursor: A cursor on the new database.
+#   - table (str): The table of the new database to look in.
+#
+#Description:
+#   - Loads every milestone already stored in table with a single query.
+#
+#Returns:
+#   - dict: {lower-case milestone version: (no_tests_total, no_tests_pass, no_tests_fail, no_tests_bug)}
+#########################################################################################################################################
+def existing_milestones(new_cursor, table):
+    new_cursor.execute(f"SELECT mileStone_Version, no_tests_total, no_tests_pass, no_tests_fail, no_tests_bug FROM {table}")
+    return {row[0].lower(): tuple(row[1:]) for row in new_cursor.fetchall()}
+
+
+@contextmanager
+def milestone_write_lock(new_connection):
+    """Serialises writers of the milestone tables across processes with a MySQL named lock.
+
+    Held until after the commit, so a concurrent run only looks for existing
+    milestones once the rows written by this one are visible.
+    """
+    with new_connection.cursor() as new_cursor:
+        new_cursor.execute("SELECT GET_LOCK(%s, %s)", (WRITE_LOCK_NAME, WRITE_LOCK_TIMEOUT))
+        if new_cursor.fetchone()[0] != 1:
+            raise RuntimeError(f"Timed out waiting for lock {WRITE_LOCK_NAME}")
+    try:
+        yield
+    finally:
+        with new_connection.cursor() as new_cursor:
+            new_cursor.execute("SELECT RELEASE_LOCK(%s)", (WRITE_LOCK_NAME,))
+
+#########################################################################################################################################
+#Name:
+#   count_rows
+#
+#Parameters:
+#   - cursor: A cursor on the old database.
+#   - roles (list): Names of the ROLES to collect.
+#   - column (str): The watermark column, only with watermarks.
+#   - watermarks (dict): {role: last counted column value, or None to count the role from the start}.
+#   - high: Upper bound of the column, so that rows arriving during the run are left for the next one.
+#
+#Description:
+#   - Runs a single query over report_view grouped by role, release, build and status for all requested roles. With
+#     watermarks, only the rows between each role's watermark and high are counted.
+#
+#Returns:
+#   - list: (q_role_name, q_release, q_build, status, count) rows.
+#########################################################################################################################################
+def count_rows(cursor, roles, column=None, watermarks=None, high=None):
+    all_builds = {}
+    for role in roles:
+        for item in ROLES[role]['releases']:
+            for build in item['builds']:
+                all_builds.setdefault(build.lower(), build)
+
+    role_placeholders = ', '.join(['%s'] * len(roles))
+    build_placeholders = ', '.join(['%s'] * len(all_builds))
+    window = ''
+    window_args = []
+    if watermarks is not None:
+        role_conditions = []
+        window_args.append(high)
+        for role in roles:
+            if watermarks.get(role) is None:
+                role_conditions.append("q_role_name = %s")
+                window_args.append(role)
+            else:
+                role_conditions.append(f"(q_role_name = %s AND {column} > %s)")
+                window_args.extend((role, watermarks[role]))
+        window = f"AND {column} <= %s AND ({' OR '.join(role_conditions)})"
+    cursor.execute(f"""
+        SELECT q_role_name, q_release, q_build, status, COUNT(*) AS count
+        FROM report_view
+        WHERE q_role_name IN ({role_placeholders})
+            AND status IN ('pass', 'fail')
+            AND q_build IN ({build_placeholders})
+            {window}
+        GROUP BY q_role_name, q_release, q_build, status;
+    """, [*roles, *sorted(all_builds.values()), *window_args])
+    rows = cursor.fetchall()
+    collector_metrics.get(COLLECTOR).count('rows_fetched', len(rows))
+    return rows
+
+#########################################################################################################################################
+#Name:
+#   split_build_data
+#
+#Parameters:
+#   - rows (list): (q_role_name, q_release, q_build, status, count) rows, as returned by count_rows.
+#   - roles (list): Names of the ROLES to collect.
+#
+#Description:
+#   - Splits the rows into one build_data dictionary per role, keeping only the active releases and builds of the registry.
+#     Builds are matched case-insensitively, the way the old per-role queries matched them, and named with their
+#     normalised spelling.
+#
+#Returns:
+#   - dict: {role: {build: {'pass': n, 'fail': n}}}
+#########################################################################################################################################
+def split_build_data(rows, roles):
+    wanted = {}
+    for role in roles:
+        for item in ROLES[role]['releases']:
+            release = item['release'].lower() if item['release'] else None
+            for build in item['builds']:
+                wanted.setdefault(role.lower(), {}).setdefault(build.lower(), set()).add(release)
+    role_names = {role.lower(): role for role in roles}
+
+    logging.info("Processing query results.")
+    all_build_data = {role: {} for role in roles}
+    for row in rows:
+        q_role_name, q_release, q_build, status, count = row
+        releases = wanted.get(q_role_name.lower(), {}).get(q_build.lower())
+        if releases is None or (None not in releases and (q_release or '').lower() not in releases):
+            continue
+        role = role_names[q_role_name.lower()]
+        # one milestone per build, whatever casing or release the rows carry
+        build = normalise_milestone(q_build)
+        build_data = all_build_data[role]
+        if build not in build_data:
+            build_data[build] = {'pass': 0, 'fail': 0}
+        build_data[build][status.lower()] += count
+    return all_build_data
+
+
+def fetch_build_data(cursor, roles):
+    "counts the whole report_view history of roles, see count_rows and split_build_data"
+    return split_build_data(count_rows(cursor, roles), roles)
+
+#########################################################################################################################################
+#Name:
+#   fetch_build_data_incremental
+#
+#Parameters:
+#   - cursor: A cursor on the old database.
+#   - roles (list): Names of the ROLES to collect.
+#   - column (str): The report_view column used as watermark; it must only grow, like an auto-increment id.
+#   - reconcile_hours (float): Age after which a role's summary is dropped and recounted from the start.
+#
+#Description:
+#   - Keeps a local summary of the grouped counts of every role (SUMMARY_STATE) and the watermark up to which it is
+#     counted. Each run reads only the rows past the watermark, adds them to the summary and moves the watermark to the
+#     highest column value seen at the start of the run. Rows which appear below the watermark later (ids committed out of
+#     order, deleted or edited rows) are picked up by the full recount every reconcile_hours, or when the role's releases or
+#     the column change.
+#
+#Returns:
+#   - dict: {role: {build: {'pass': n, 'fail': n}}}, like fetch_build_data.
+#########################################################################################################################################
+def fetch_build_data_incremental(cursor, roles, column, reconcile_hours=RECONCILE_HOURS):
+    state = load_state(SUMMARY_STATE)
+    if state.get('column') != column:
+        state = {'column': column, 'roles': {}}
+    now = time.time()
+    summaries = {}
+    for role in roles:
+        summary = state['roles'].get(role)
+        if (not summary or summary['releases'] != ROLES[role]['releases']
+                or now - summary['reconciled_at'] >= reconcile_hours * 3600):
+            summary = {'releases': ROLES[role]['releases'], 'reconciled_at': now, 'watermark': None, 'rows': []}
+        summaries[role] = summary
+
+    cursor.execute(f"SELECT MAX({column}) FROM report_view")
+    high = cursor.fetchone()[0]
+    rows = []
+    if high is not None:
+        rows = count_rows(cursor, roles, column, {role: summary['watermark'] for role, summary in summaries.items()}, high)
+        # the watermark is stored as JSON; timestamps go as text, which MySQL compares with DATETIME columns
+        high = high if isinstance(high, (int, float)) else str(high)
+
+    logging.info(f"Adding {len(rows)} new report_view groups to the milestone summary "
+                 f"({', '.join(role for role in roles if summaries[role]['watermark'] is None) or 'no'} full recount).")
+    role_names = {role.lower(): role for role in roles}
+    for role, summary in summaries.items():
+        counts = {tuple(row[:4]): row[4] for row in summary['rows']}
+        for row in rows:
+            if role_names.get(row[0].lower()) == role:
+                counts[tuple(row[:4])] = counts.get(tuple(row[:4]), 0) + row[4]
+        summary['rows'] = [[*key, count] for key, count in sorted(counts.items(), key=lambda item: str(item[0]))]
+        if high is not None:
+            summary['watermark'] = high
+        state['roles'][role] = summary
+    save_state(SUMMARY_STATE, state)
+
+    return split_build_data([row for role in roles for row in summaries[role]['rows']], roles)
+
+
+def watermark_column(config):
+    "returns the report_view column named by WATERMARK_COLUMN_KEY in config, id by default"
+    column = config.get(WATERMARK_COLUMN_KEY) or 'id'
+    if not re.fullmatch(r'\w+', column):
+        raise ValueError(f"invalid {WATERMARK_COLUMN_KEY}: {column}")
+    return column
+
+def summarise(build_data, bug_counts):
+    "yields (milestone, (no_tests_total, no_tests_pass, no_tests_fail, no_tests_bug)) for every build"
+    for build, counts in build_data.items():
+        no_tests_pass = counts.get('pass', 0)
+        no_tests_fail = counts.get('fail', 0)
+        no_tests_total = no_tests_pass + no_tests_fail
+        no_tests_bug = bug_counts.get(build.lower(), 0)
+        yield build, (no_tests_total, no_tests_pass, no_tests_fail, no_tests_bug)
+
+
+def milestone_lines(role, build_data, bug_counts, timestamp=None):
+    """Returns the milestones of role as influx lines, one per milestone.
+
+    The measurement is the role's table, tagged with the milestone and role;
+    the fields carry the same names as the table columns, plus stale=true
+    when build_data or bug_counts are cached values served while their source
+    was down.
+    """
+    timestamp = timestamp or time.time_ns()
+    stale = resilience.is_stale(build_data) or resilience.is_stale(bug_counts)
+    lines = []
+    for milestone, values in summarise(build_data, bug_counts):
+        fields = dict(zip(('no_tests_total', 'no_tests_pass', 'no_tests_fail', 'no_tests_bug'), values))
+        fields['stale'] = stale
+        lines.append(format_line(ROLES[role]['table'], {'milestone': milestone, 'role': role, 'machine': hostname},
+                                 fields, timestamp))
+    return lines
+
+#########################################################################################################################################
+#Name:
+#   insert_build_data
+#
+#Parameters:
+#   - new_connection: An open connection to the new database.
+#   - role (str): The ROLES entry the build_data belongs to.
+#   - build_data (dict): Pass/fail counts per build, as returned by fetch_build_data.
+#   - bug_counts (dict): Bug counts per lower-case milestone, as returned by get_bugs_count.
+#   - refresh (bool): Update the counts of milestones which are already present instead of skipping them.
+#
+#Description:
+#   - Loads the milestones already stored in the role's table with one query and writes all new milestones with a single
+#     executemany. In refresh mode, present milestones whose counts changed are updated the same way.
+#     The caller holds milestone_write_lock and commits.
+#########################################################################################################################################
+def insert_build_data(new_connection, role, build_data, bug_counts, refresh=False):
+    table = ROLES[role]['table']
+
+    metrics = collector_metrics.get(COLLECTOR)
+
+    with new_connection.cursor() as new_cursor:
+        with metrics.phase('milestone_checks'):
+            present = existing_milestones(new_cursor, table)
+        new_rows = []
+        changed_rows = []
+        execution_date = datetime.now()
+        for mileStone_Version, values in summarise(build_data, bug_counts):
+            build = mileStone_Version
+            if build.lower() not in present:
+                new_rows.append((*values, mileStone_Version, execution_date))
+            elif refresh and present[build.lower()] != values:
+                changed_rows.append((*values, mileStone_Version))
+            else:
+                logging.info(f"Milestone version {mileStone_Version} already present in {table}. Skipping insertion.")
+
+        if new_rows:
+            logging.info(f"Inserting {', '.join(row[4] for row in new_rows)} into {table}.")
+            with metrics.phase('inserts'):
+                new_cursor.executemany(f"""
+                    INSERT INTO {table}(no_tests_total, no_tests_pass, no_tests_fail, no_tests_bug, mileStone_Version, execution_date)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                """, new_rows)
+            metrics.count('rows_inserted', len(new_rows))
+        if changed_rows:
+            logging.info(f"Refreshing {', '.join(row[4] for row in changed_rows)} in {table}.")
+            with metrics.phase('inserts'):
+                new_cursor.executemany(f"""
+                    UPDATE {table}
+                    SET no_tests_total = %s, no_tests_pass = %s, no_tests_fail = %s, no_tests_bug = %s
+                    WHERE mileStone_Version = %s
+                """, changed_rows)
+            metrics.count('rows_updated', len(changed_rows))
+
+
+def old_db_pool(config):
+    return mysql_pool('old_db', host=config.get('db_host', ''), user=config.get('db_user', ''),
+                      password=config.get('db_password', ''), db=config.get('db_name', ''))
+
+
+def new_db_pool(config):
+    return mysql_pool('new_db', host=config.get('new_db_host', ''), user=config.get('new_db_user', ''),
+                      password=config.get('new_db_password', ''), db=config.get('new_db_name', ''))
+
+
+def cached_build_data(roles):
+    "returns the build data of roles from the incremental summary as resilience.Stale values, or None if a role has none"
+    summaries = load_state(SUMMARY_STATE).get('roles', {})
+    if any(summaries.get(role, {}).get('releases') != ROLES[role]['releases'] for role in roles):
+        return None
+    build_data = split_build_data([row for role in roles for row in summaries[role]['rows']], roles)
+    return {role: resilience.Stale(build_data[role]) for role in roles}
+
+
+def query_build_data(config, roles, incremental=False):
+    """Runs fetch_build_data, or fetch_build_data_incremental, for roles on a pooled old-db connection.
+
+    Connection failures are retried within the run deadline. When the old
+    database stays unreachable, the last incremental summary is returned
+    instead, see cached_build_data; without one the error is raised.
+    """
+    def query():
+        with old_db_pool(config).connection() as connection:
+            logging.info(f"Executing SQL query on old database for {', '.join(roles)}.")
+            if incremental:
+                return fetch_build_data_incremental(connection.cursor(), roles, watermark_column(config))
+            return fetch_build_data(connection.cursor(), roles)
+
+    with collector_metrics.get(COLLECTOR).phase('old_db_query'):
+        try:
+            return resilience.call('old_db', query, retry_on=db_transient, collector=COLLECTOR)
+        except Exception as e:
+            if not (isinstance(e, resilience.CircuitOpen) or db_transient(e)):
+                raise
+            cached = cached_build_data(roles)
+            if cached is None:
+                raise
+            logging.warning(f"Old database unavailable ({e}), using the last milestone summary.")
+            return cached
+
+
+def role_bug_counts(config, role):
+    "returns get_bugs_count for the Confluence page of role, None when it could not be read"
+    logging.info(f"Fetching {role} bug counts from Confluence.")
+    with collector_metrics.get(COLLECTOR).phase('confluence'):
+        return get_bugs_count(config.get(ROLES[role]['confluence_url'], ''), config.get('username', ''),
+                              config.get('password', ''), ROLES[role]['bug_milestones'])
+
+
+def all_bug_counts(config, roles):
+    "returns {role: bug counts, or None when the page could not be read} with the Confluence pages of all roles fetched at once"
+    logging.info(f"Fetching bug counts of {', '.join(roles)} from Confluence.")
+    with collector_metrics.get(COLLECTOR).phase('confluence'):
+        return get_bugs_counts({role: (config.get(ROLES[role]['confluence_url'], ''), ROLES[role]['bug_milestones'])
+                                for role in roles}, config.get('username', ''), config.get('password', ''))
+
+
+def write_build_data(config, all_build_data, bug_counts, refresh=False):
+    """Writes the milestones of every role in bug_counts in one transaction on a pooled new-db connection.
+
+    A transaction which failed on a lost connection was rolled back, and is
+    retried within the run deadline.
+    """
+    def write():
+        with new_db_pool(config).connection() as new_connection:
+            with milestone_write_lock(new_connection):
+                for role in bug_counts:
+                    insert_build_data(new_connection, role, all_build_data[role], bug_counts[role], refresh)
+
+                logging.info("Committing transaction to the new database.")
+                new_connection.commit()
+
+    resilience.call('new_db', write, retry_on=db_transient, collector=COLLECTOR)
+
+
+def log_pool_stats():
+    for name, stats in pool_stats().items():
+        logging.info(f"Connection pool {name}: {stats['connects']} connects in {stats['connect_seconds']:.3f}s, "
+                     f"{stats['checkouts']} checkouts waiting {stats['wait_seconds']:.3f}s")
+
+
+def begin_metrics():
+    "starts the self-instrumentation of a milestone run; pass the result to finish_metrics"
+    collector_metrics.begin(COLLECTOR)
+    return pool_stats()
+
+
+def finish_metrics(pools_before) -> list:
+    "adds the connection pool times of the run and returns its sle_perf_collector and sle_perf_breaker lines, if enabled"
+    metrics = collector_metrics.get(COLLECTOR)
+    for name, stats in pool_stats().items():
+        before = pools_before.get(name, {})
+        metrics.add_time(f"{name}_connect", stats['connect_seconds'] - before.get('connect_seconds', 0.0))
+        metrics.add_time(f"{name}_checkout_wait", stats['wait_seconds'] - before.get('wait_seconds', 0.0))
+    return collector_metrics.lines(COLLECTOR) + resilience.breaker_lines(DEPENDENCIES)
+
+#########################################################################################################################################
+#Name:
+#   insert_status_counts
+#
+#Description:
+#   - Retrieves test statuses of all requested roles from the old database in a single pass, fetches their bug counts from
+#     Confluence (all pages at once), and then inserts aggregated test data of every role into its table of the new database. Connections come
+#     from the shared pools. sle_perf_runner.py runs the same steps concurrently.
+#   - A role whose Confluence page could not be read is skipped, rather than stored with 0 bugs.
+#
+#Parameters:
+#   - roles (list): Names of the ROLES to collect; all of them by default.
+#   - refresh (bool): Update the counts of milestones already present, see insert_build_data.
+#   - output (str): 'mysql' writes the new database, 'influx' returns the milestones as line protocol instead (see
+#     milestone_lines), 'both' does both.
+#   - incremental (bool): Count only the report_view rows added since the last run, see fetch_build_data_incremental.
+#
+#Returns:
+#   - list: The influx lines of the run: milestones in influx output, plus the sle_perf_collector line when
+#     self-instrumentation is enabled.
+#
+#Exceptions:
+#   - Logs any errors encountered during execution.
+#########################################################################################################################################
+def insert_status_counts(roles=None, refresh=False, output='mysql', incremental=False):
+    roles = list(roles or ROLES)
+    lines = []
+    pools_before = begin_metrics()
+    with collector_metrics.get(COLLECTOR).phase('config'):
+        config = load_sle_config()
+    try:
+        all_build_data = query_build_data(config, roles, incremental)
+        bug_counts = {role: counts for role, counts in all_bug_counts(config, roles).items() if counts is not None}
+        skipped = [role for role in roles if role not in bug_counts]
+        if skipped:
+            logging.warning(f"Skipping {', '.join(skipped)}: no bug counts could be read from Confluence.")
+        if output in ('influx', 'both'):
+            for role in bug_counts:
+                lines.extend(milestone_lines(role, all_build_data[role], bug_counts[role]))
+        if output in ('mysql', 'both') and bug_counts:
+            write_build_data(config, all_build_data, bug_counts, refresh)
+
+    except pymysql.Error as e:
+        logging.error(f"An error occurred: {e}")
+    except Exception as e:
+        logging.error(f"An error occurred: {e}")
+    finally:
+        log_pool_stats()
+    return lines + finish_metrics(pools_before)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate report_view pass/fail counts per milestone into the new database.")
+    parser.add_argument('roles', nargs='*', metavar='role', help=f"roles to collect (default: all of {', '.join(ROLES)})")
+    parser.add_argument('--refresh', action='store_true',
+                        help="update the counts of milestones already present instead of skipping them")
+    parser.add_argument('--output', choices=OUTPUTS, default='mysql',
+                        help="write the milestones to the new database, print them as influx lines, or both (default: %(default)s)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="count only the report_view rows added since the last run into a local summary "
+                             "(recounted in full every SLE_PERF_RECONCILE_HOURS, default 24)")
+    args = parser.parse_args(argv)
+    unknown = [role for role in args.roles if role not in ROLES]
+    if unknown:
+        parser.error(f"unknown role(s): {', '.join(unknown)}")
+    write_lines(insert_status_counts(args.roles, args.refresh, args.output, args.incremental))
+    close_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""The roles, releases and milestones collected by milestone_collector.py.
+
+The registry is configuration, read from milestone_registry.json next to this
+file or from the JSON file named by SLE_PERF_MILESTONE_REGISTRY. Each role has:
+
+  - table:           table of the new database receiving one row per milestone.
+  - confluence_url:  'sle_config' key of the Confluence page holding the bug counts.
+  - releases:        {"release": ..., "builds": [...]} entries; a release of null matches every release. Entries with
+                     "active": false stay in the file for reference but are not collected. A milestone is identified
+                     by its build name alone, in the role's table as on its Confluence page, so the active releases
+                     of a role must not share build names; a release reusing them (SP6's Beta1 next to SP5's) needs
+                     a role, table and Confluence page of its own.
+  - bug_milestones:  optional, milestone names as written on the Confluence page ("<name> Total Bugs =<n>");
+                     by default the builds of the active releases.
+
+Milestone names are normalised to one spelling (Beta1, PublicRC, GMC, Build2.1, ...), whichever casing the
+registry, report_view or Confluence use.
+"""
+
+import json
+import os
+import re
+
+REGISTRY_PATH = os.environ.get('SLE_PERF_MILESTONE_REGISTRY',
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), 'milestone_registry.json'))
+
+# lower-case milestone prefix: its spelling
+MILESTONE_PREFIXES = {
+    'alpha': 'Alpha',
+    'beta': 'Beta',
+    'publicbeta': 'PublicBeta',
+    'rc': 'RC',
+    'publicrc': 'PublicRC',
+    'gmc': 'GMC',
+    'gm': 'GM',
+    'build': 'Build',
+}
+
+
+def normalise_milestone(name: str) -> str:
+    "returns the usual spelling of milestone name, e.g. Beta1 for beta1 and PublicRC for publicrc; unknown names as given"
+    match = re.fullmatch(r'([a-z]+?)(\d[\w.]*)?', name.lower())
+    if not match or match.group(1) not in MILESTONE_PREFIXES:
+        return name
+    return MILESTONE_PREFIXES[match.group(1)] + (match.group(2) or '')
+
+
+def load_registry(path=REGISTRY_PATH) -> dict:
+    """Returns the registry at path as {role: {'table', 'confluence_url', 'releases', 'bug_milestones'}}.
+
+    Only active releases are kept, and every milestone name is normalised.
+    Raises ValueError for a role missing a key or whose active releases share a build.
+    """
+    with open(path) as f:
+        registry = json.load(f)
+
+    roles = {}
+    for role, role_config in registry.items():
+        missing = [key for key in ('table', 'confluence_url', 'releases') if key not in role_config]
+        if missing:
+            raise ValueError(f"{path}: role {role} lacks {', '.join(missing)}")
+        releases = [{'release': item.get('release'), 'builds': [normalise_milestone(b) for b in item['builds']]}
+                    for item in role_config['releases'] if item.get('active', True)]
+        owners = {}
+        for item in releases:
+            for build in dict.fromkeys(item['builds']):
+                owners.setdefault(build, []).append(item['release'] or 'any release')
+        shared = {build: owner for build, owner in owners.items() if len(owner) > 1}
+        if shared:
+            raise ValueError(f"{path}: role {role} has builds in several active releases, whose counts would be merged: "
+                             + '; '.join(f"{build} in {', '.join(owner)}" for build, owner in shared.items()))
+        builds = list(owners)
+        bug_milestones = [normalise_milestone(m) for m in role_config.get('bug_milestones', builds)]
+        roles[role] = {
+            'table': role_config['table'],
+            'confluence_url': role_config['confluence_url'],
+            'releases': releases,
+            'bug_milestones': list(dict.fromkeys(bug_milestones)),
+        }
+    return roles
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""Retries and circuit breakers around the external dependencies of the collectors.
+
+call() runs a request against a named dependency (confluence, old_db,
+gitlab, ...) and retries transient failures with jittered exponential
+backoff, but never past the run deadline, which is kept below the telegraf
+timeout. A dependency failing FAILURE_THRESHOLD calls in a row has its
+breaker opened: for BREAKER_OPEN_SECONDS every call fails at once with
+CircuitOpen instead of waiting for timeouts, then one trial call decides
+whether it closes again. Breakers are saved in a state file, so separate
+collector runs skip a dependency known to be down as well.
+
+Callers falling back to a cached value wrap it in Stale, so that what they
+emit from it can be marked as such.
+"""
+
+import logging
+import os
+import random
+import time
+from socket import getfqdn
+
+import requests
+
+import collector_metrics
+from line_protocol import format_line
+from sle_state import load_state, locked, save_state, state_path
+
+# seconds a run may take, below the 2m telegraf timeout; no retry is started past it
+DEADLINE = float(os.environ.get('SLE_PERF_DEADLINE', '110'))
+
+# attempts per call, and the base of the exponential backoff between them (seconds)
+ATTEMPTS = int(os.environ.get('SLE_PERF_RETRY_ATTEMPTS', '3'))
+BACKOFF = 1.0
+
+# failed calls in a row which open a breaker, and seconds it stays open
+FAILURE_THRESHOLD = int(os.environ.get('SLE_PERF_BREAKER_FAILURES', '3'))
+BREAKER_OPEN_SECONDS = int(os.environ.get('SLE_PERF_BREAKER_OPEN', '300'))
+
+BREAKER_STATE = 'circuit_breakers'
+
+MEASUREMENT = 'sle_perf_breaker'
+
+# failures worth another attempt: the connection could not be made, broke off or timed out. Not any
+# OSError, which every requests exception is, bad URLs and undecodable bodies included. HTTP errors
+# only count when the server is overloaded or failing, see transient
+TRANSIENT = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError,
+             ConnectionError, TimeoutError)
+
+hostname = getfqdn()
+
+deadline = time.monotonic() + DEADLINE
+
+
+class CircuitOpen(Exception):
+    "raised in place of calling a dependency whose breaker is open"
+
+
+class Stale(dict):
+    "a cached value served because its dependency failed"
+
+
+def is_stale(value) -> bool:
+    return isinstance(value, Stale)
+
+
+def set_deadline(value: float):
+    "sets the deadline (a time.monotonic() value) of the run starting now"
+    global deadline
+    deadline = value
+
+
+def transient(err, retry_on=TRANSIENT) -> bool:
+    "tells whether err is worth a retry; retry_on is a tuple of exception types or a predicate taking err"
+    if not isinstance(retry_on, tuple):
+        return retry_on(err)
+    if isinstance(err, requests.exceptions.HTTPError):
+        return err.response is None or err.response.status_code >= 500 or err.response.status_code == 429
+    if isinstance(err, requests.exceptions.SSLError):
+        # a certificate the client rejects stays rejected
+        return False
+    return isinstance(err, retry_on)
+
+
+def breaker(dependency) -> dict:
+    "returns the saved breaker of dependency: failures in a row and when it opened, if it did"
+    return load_state(BREAKER_STATE).get(dependency, {'failures': 0, 'opened_at': None})
+
+
+def is_open(dependency, now=None) -> bool:
+    "tells whether dependency is to be skipped; an open breaker lets a trial call through once it expires"
+    opened_at = breaker(dependency)['opened_at']
+    return opened_at is not None and (now or time.time()) - opened_at < BREAKER_OPEN_SECONDS
+
+
+def record(dependency, failed: bool):
+    "counts a call of dependency, opening its breaker after FAILURE_THRESHOLD failures in a row"
+    if not failed and breaker(dependency)['failures'] == 0:
+        return
+    with locked(state_path(BREAKER_STATE) + '.lock'):
+        breakers = load_state(BREAKER_STATE)
+        previous = breakers.get(dependency, {'failures': 0, 'opened_at': None})
+        if not failed:
+            if previous['opened_at'] is not None:
+                logging.info(f"{dependency} is back, closing its circuit breaker")
+            breakers[dependency] = {'failures': 0, 'opened_at': None}
+        else:
+            failures = previous['failures'] + 1
+            opened_at = previous['opened_at']
+            if failures >= FAILURE_THRESHOLD:
+                if opened_at is None:
+                    logging.warning(f"{dependency} failed {failures} times in a row, "
+                                    f"skipping it for {BREAKER_OPEN_SECONDS}s")
+                opened_at = time.time()
+            breakers[dependency] = {'failures': failures, 'opened_at': opened_at}
+        if breakers[dependency] != previous:
+            save_state(BREAKER_STATE, breakers)
+
+
+def call(dependency, func, *args, retry_on=TRANSIENT, collector=None, **kwargs):
+    """Returns func(*args, **kwargs), retrying transient failures within the run deadline.
+
+    retry_on are the exception types worth retrying, or a predicate telling
+    whether an exception is, see transient; other
+    errors, such as a bad URL or a 404, are raised at once and leave the
+    breaker as it is. Raises CircuitOpen without calling func while the
+    breaker of dependency is open. Retries and the time slept between them
+    go to the metrics of collector.
+    """
+    metrics = collector_metrics.get(collector) if collector else collector_metrics.NULL
+    if is_open(dependency):
+        metrics.count('breaker_skips')
+        raise CircuitOpen(f"{dependency} is failing, skipped until its circuit breaker closes")
+    for attempt in range(1, ATTEMPTS + 1):
+        try:
+            result = func(*args, **kwargs)
+        except Exception as err:
+            if not transient(err, retry_on):
+                raise
+            # full jitter, so that concurrent callers do not retry in lockstep
+            wait = random.uniform(0, BACKOFF * 2 ** (attempt - 1))
+            if attempt == ATTEMPTS or time.monotonic() + wait >= deadline:
+                record(dependency, True)
+                raise
+            logging.warning(f"{dependency} failed ({err}), attempt {attempt} of {ATTEMPTS}, retrying in {wait:.1f}s")
+            metrics.count('retries')
+            metrics.add_time('retry_wait', wait)
+            time.sleep(wait)
+        else:
+            record(dependency, False)
+            return result
+
+
+def breaker_lines(dependencies) -> list:
+    "returns the breaker state of dependencies as sle_perf_breaker lines when self-instrumentation is enabled"
+    if not collector_metrics.ENABLED:
+        return []
+    now = time.time()
+    lines = []
+    for dependency in dependencies:
+        lines.append(format_line(MEASUREMENT, {'dependency': dependency, 'machine': hostname},
+                                 {'open': is_open(dependency, now), 'failures': int(breaker(dependency)['failures'])},
+                                 time.time_ns()))
+    return lines
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Access to the 'sle_config' pillar shared by all collectors.
+
+The pillar is read through a local snapshot, so that most runs neither import
+salt nor wait for the salt-master.
+"""
+
+import logging
+import os
+import time
+
+from sle_state import load_state, save_state
+
+SNAPSHOT_NAME = 'sle_config'
+
+# seconds the snapshot is used before the pillar is asked again
+SNAPSHOT_TTL = int(os.environ.get('SLE_PERF_CONFIG_TTL', '3600'))
+
+# how the last load_sle_config() call went: source is 'snapshot', 'pillar' or 'stale snapshot'
+load_stats = {'seconds': 0.0, 'source': None}
+
+
+def load_pillar() -> dict:
+    "returns the 'sle_config' pillar of this minion, or an empty dict when it is not set"
+    # salt is slow to import, only pay for it when the snapshot is stale
+    import salt.client
+
+    # Initialize a Salt client
+    salt_client = salt.client.LocalClient()
+
+    # Retrieve 'sle_config' pillar data
+    sle_config_pillar_data = salt_client.cmd('127.0.0.1', 'pillar.item', ['sle_config'])
+    if '127.0.0.1' in sle_config_pillar_data:
+        return sle_config_pillar_data.get('127.0.0.1', {}).get('sle_config', {})
+
+    logging.error("'sle_config' not found in pillar data.")
+    return {}
+
+
+def load_sle_config(ttl=SNAPSHOT_TTL) -> dict:
+    """Returns the 'sle_config' pillar, from the local snapshot while it is younger than ttl.
+
+    A stale snapshot is refreshed from the pillar; if that fails, the stale
+    snapshot is used rather than nothing. The snapshot holds credentials and is
+    only readable by its owner.
+    """
+    start = time.monotonic()
+    snapshot = load_state(SNAPSHOT_NAME)
+    config = snapshot.get('config')
+    age = time.time() - snapshot.get('saved_at', 0)
+
+    if config and age < ttl:
+        source = 'snapshot'
+    else:
+        try:
+            pillar = load_pillar()
+        except Exception as e:
+            logging.error(f"Could not read the 'sle_config' pillar: {e}")
+            pillar = {}
+        if pillar:
+            config = pillar
+            source = 'pillar'
+            save_state(SNAPSHOT_NAME, {'saved_at': time.time(), 'config': config})
+        elif config:
+            source = 'stale snapshot'
+            logging.warning(f"Using the 'sle_config' snapshot from {age / 3600:.1f} hours ago")
+        else:
+            config = {}
+            source = None
+
+    load_stats['seconds'] = time.monotonic() - start
+    load_stats['source'] = source
+    logging.info(f"Loaded 'sle_config' from {source} in {load_stats['seconds']:.3f}s")
+    return config
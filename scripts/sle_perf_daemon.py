@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Runs the collectors from one long-lived process for telegraf's inputs.execd.
+
+Every newline read on stdin (signal = "STDIN") or SIGUSR1 (signal = "SIGUSR1")
+triggers a collection: each source whose schedule is due runs, and the line
+protocol of all of them is written to stdout. Interpreter, imports, HTTP
+sessions, pooled DB connections and caches stay warm between collections.
+The process exits when telegraf closes stdin.
+"""
+
+import argparse
+import logging
+import queue
+import re
+import signal
+import sys
+import threading
+import time
+from functools import partial
+
+import github2_commits
+import github_auth
+import gitlab_commits
+import milestone_collector
+import resilience
+from commit_common import commit_emitted
+from line_protocol import write_lines
+
+# source name: (function returning influx lines, default interval)
+SOURCES = {
+    'gitlab_commits': (gitlab_commits.collect, '12h'),
+    'github2_commits': (github2_commits.collect, '12h'),
+    'github_auth': (github_auth.collect, '12h'),
+    'milestones': (milestone_collector.insert_status_counts, '12h'),
+}
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_interval(text: str) -> float:
+    "converts an interval such as 90s, 30m, 12h or 1d to seconds"
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)([smhd]?)', text.strip())
+    if not match:
+        raise ValueError(f"invalid interval: {text}")
+    return float(match.group(1)) * UNITS[match.group(2) or 's']
+
+
+def parse_schedule(entries) -> dict:
+    "turns SOURCE=INTERVAL entries into {source: seconds}, starting from the defaults"
+    schedule = {name: parse_interval(interval) for name, (_, interval) in SOURCES.items()}
+    for entry in entries:
+        name, _, interval = entry.partition('=')
+        if name not in SOURCES:
+            raise ValueError(f"unknown source: {name}")
+        schedule[name] = parse_interval(interval)
+    return schedule
+
+
+def run_due(schedule: dict, last_run: dict, now: float):
+    "runs every source which is due at now and writes their lines to stdout in one go"
+    lines = []
+    results = []
+    resilience.set_deadline(now + resilience.DEADLINE)
+    for name, interval in schedule.items():
+        if name in last_run and now - last_run[name] < interval:
+            continue
+        last_run[name] = now
+        start = time.monotonic()
+        try:
+            results.append(SOURCES[name][0]())
+            lines.extend(results[-1])
+        except Exception as e:
+            logging.exception(f"{name} failed: {e}")
+        logging.info(f"{name} collected in {time.monotonic() - start:.1f}s")
+    write_lines(lines)
+    commit_emitted(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the sle-perf collectors to telegraf inputs.execd.")
+    parser.add_argument('--schedule', action='append', default=[], metavar='SOURCE=INTERVAL',
+                        help=f"how often to run a source, e.g. gitlab_commits=6h (sources: {', '.join(SOURCES)}; default 12h)")
+    parser.add_argument('--only', action='append', choices=list(SOURCES),
+                        help="run only these sources (repeatable)")
+    parser.add_argument('--milestone-output', choices=milestone_collector.OUTPUTS, default='mysql',
+                        help="where the milestones source writes to (default: %(default)s)")
+    parser.add_argument('--milestone-incremental', action='store_true',
+                        help="count only the report_view rows added since the previous milestones run")
+    parser.add_argument('--once', action='store_true', help="collect every scheduled source once and exit")
+    args = parser.parse_args()
+
+    try:
+        schedule = parse_schedule(args.schedule)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.milestone_output != 'mysql' or args.milestone_incremental:
+        SOURCES['milestones'] = (partial(milestone_collector.insert_status_counts, output=args.milestone_output,
+                                         incremental=args.milestone_incremental),
+                                 SOURCES['milestones'][1])
+    if args.only:
+        schedule = {name: interval for name, interval in schedule.items() if name in args.only}
+
+    last_run = {}
+    if args.once:
+        run_due(schedule, last_run, time.monotonic())
+        return
+
+    triggers = queue.Queue()
+
+    def read_stdin():
+        for _ in sys.stdin:
+            triggers.put(True)
+        triggers.put(None)
+
+    # a plain flag, taking locks from a signal handler could deadlock the main thread
+    signalled = [False]
+    signal.signal(signal.SIGUSR1, lambda signum, frame: signalled.__setitem__(0, True))
+    threading.Thread(target=read_stdin, name='stdin', daemon=True).start()
+
+    while True:
+        try:
+            trigger = triggers.get(timeout=1)
+        except queue.Empty:
+            if not signalled[0]:
+                continue
+            trigger = True
+        if trigger is None:
+            break
+        signalled[0] = False
+        run_due(schedule, last_run, time.monotonic())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Runs every data source concurrently under one deadline, for telegraf inputs.exec.
+
+The old-db query, the Confluence page of every role and the GitHub/GitLab
+commit collectors all start at once, so a run takes about as long as the
+slowest source. The deadline is kept below the telegraf timeout: whatever
+has finished by then is written and printed, the rest is abandoned and
+logged, instead of telegraf killing the process with nothing emitted.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import collector_metrics
+import github2_commits
+import github_auth
+import gitlab_commits
+import milestone_collector
+import resilience
+from commit_common import commit_emitted
+from line_protocol import write_lines
+from sle_config import load_sle_config
+
+# seconds of the deadline kept for writing the milestones once their inputs are in
+WRITE_RESERVE = 10
+
+COMMIT_SOURCES = {
+    'gitlab_commits': gitlab_commits.collect,
+    'github2_commits': github2_commits.collect,
+    'github_auth': github_auth.collect,
+}
+
+
+async def run(deadline: float, roles, commit_sources, refresh=False, output='mysql', incremental=False):
+    """Collects everything until deadline (a time.monotonic() value).
+
+    Milestones of a role are written only when both the old-db query and the
+    role's Confluence page finished and the page could be read, so a late or
+    failed page never stores 0 bugs.
+    Returns the influx lines of the commit collectors which finished, the
+    results of those collectors, to commit_emitted once the lines were
+    written, and whether any source had to be abandoned.
+    """
+    loop = asyncio.get_running_loop()
+    pools_before = milestone_collector.begin_metrics()
+    with collector_metrics.get(milestone_collector.COLLECTOR).phase('config'):
+        config = await loop.run_in_executor(None, load_sle_config)
+
+    async def call(func, *args):
+        return await loop.run_in_executor(None, func, *args)
+
+    def start(name, func, *args):
+        return asyncio.create_task(call(func, *args), name=name)
+
+    commit_tasks = [start(name, COMMIT_SOURCES[name]) for name in commit_sources]
+    db_task = start('old_db', milestone_collector.query_build_data, config, roles, incremental) if roles else None
+    bug_tasks = {role: start(f"confluence {role}", milestone_collector.role_bug_counts, config, role) for role in roles}
+
+    tasks = [*commit_tasks, *bug_tasks.values()] + ([db_task] if db_task else [])
+    await asyncio.wait(tasks, timeout=max(0, deadline - WRITE_RESERVE - time.monotonic()))
+
+    def result(task):
+        if not task.done() or task.exception():
+            return None
+        return task.result()
+
+    # the write starts once its inputs are in; still running sources get the reserve as well
+    lines = []
+    if db_task and result(db_task) is not None:
+        # None: the task failed, did not finish, or its page could not be read
+        bug_counts = {role: result(task) for role, task in bug_tasks.items() if result(task) is not None}
+        skipped = [role for role in bug_tasks if role not in bug_counts]
+        if skipped:
+            logging.warning(f"Skipping the milestones of {', '.join(skipped)}: no bug counts from Confluence.")
+        if output in ('influx', 'both'):
+            for role, role_bug_counts in bug_counts.items():
+                lines.extend(milestone_collector.milestone_lines(role, result(db_task)[role], role_bug_counts))
+        if bug_counts and output in ('mysql', 'both'):
+            tasks.append(start('new_db', milestone_collector.write_build_data, config, result(db_task), bug_counts, refresh))
+    pending = [task for task in tasks if not task.done()]
+    if pending:
+        await asyncio.wait(pending, timeout=max(0, deadline - time.monotonic()))
+
+    abandoned = False
+    for task in tasks:
+        if not task.done():
+            abandoned = True
+            logging.warning(f"{task.get_name()} did not finish before the deadline, skipping it")
+        elif task.exception():
+            logging.error(f"{task.get_name()} failed: {task.exception()}")
+
+    # only results taken here are committed; a collector finishing later emits its days again next run
+    results = [result(task) for task in commit_tasks if result(task) is not None]
+    for commit_result in results:
+        lines.extend(commit_result)
+    if roles:
+        lines.extend(milestone_collector.finish_metrics(pools_before))
+    return lines, results, abandoned
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run all sle-perf collectors concurrently under one deadline.")
+    parser.add_argument('--deadline', type=float, default=resilience.DEADLINE,
+                        help="seconds the run may take (default: %(default)s, env SLE_PERF_DEADLINE)")
+    parser.add_argument('--roles', nargs='*', default=list(milestone_collector.ROLES),
+                        help="milestone roles to collect (default: all)")
+    parser.add_argument('--commits', nargs='*', default=list(COMMIT_SOURCES), choices=list(COMMIT_SOURCES),
+                        help="commit collectors to run (default: all)")
+    parser.add_argument('--refresh', action='store_true',
+                        help="update the counts of milestones already present instead of skipping them")
+    parser.add_argument('--output', choices=milestone_collector.OUTPUTS, default='mysql',
+                        help="write the milestones to the new database, print them as influx lines, or both (default: %(default)s)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="count only the report_view rows added since the last run, see milestone_collector.py")
+    args = parser.parse_args()
+    unknown = [role for role in args.roles if role not in milestone_collector.ROLES]
+    if unknown:
+        parser.error(f"unknown role(s): {', '.join(unknown)}")
+
+    deadline = time.monotonic() + args.deadline
+    # retries of the sources stop in time for the write
+    resilience.set_deadline(deadline - WRITE_RESERVE)
+    loop = asyncio.new_event_loop()
+    # enough threads for every source to start at once
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=len(args.roles) + len(args.commits) + 2))
+    lines, results, abandoned = loop.run_until_complete(run(deadline, args.roles, args.commits, args.refresh, args.output, args.incremental))
+    write_lines(lines)
+    commit_emitted(results)
+
+    if abandoned:
+        # threads of abandoned sources cannot be cancelled; do not wait for them at exit
+        logging.shutdown()
+        os._exit(0)
+    milestone_collector.log_pool_stats()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"Small JSON state files kept between collector runs."
+
+import fcntl
+import json
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+
+STATE_DIR = os.environ.get('SLE_PERF_STATE_DIR', '/var/lib/telegraf/sle-perf')
+
+
+def state_path(name: str) -> str:
+    return os.path.join(STATE_DIR, f"{name}.json")
+
+
+def load_state(name: str, default=None):
+    "returns the saved state called name, or default when it is missing or unreadable"
+    path = state_path(name)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logging.warning(f"Ignoring unreadable state file {path}: {e}")
+    return {} if default is None else default
+
+
+def write_json(path: str, data) -> bool:
+    "atomically replaces the JSON file at path; failures are logged, not raised"
+    directory = os.path.dirname(path)
+    tmp_path = None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, separators=(',', ':'), sort_keys=True)
+        os.replace(tmp_path, path)
+        return True
+    except (OSError, TypeError, ValueError) as e:
+        logging.warning(f"Could not save state file {path}: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        return False
+
+
+def save_state(name: str, data) -> bool:
+    "atomically replaces the state file called name"
+    return write_json(state_path(name), data)
+
+
+@contextmanager
+def locked(path):
+    "holds an exclusive lock on path for the duration of the with block"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)